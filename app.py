@@ -1,11 +1,45 @@
+import glob
+import io
+import json
+import logging
 import os
+import shutil
+import threading
+import time
+from typing import TYPE_CHECKING
 
-import geopandas as gpd
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import plotly.io as pio
 import streamlit as st
 
+from bundle import (
+    BUNDLE_ENV_VAR, FIGURES_DIR, TABLES_DIR, entry_name, manifest_stamp, read_bundle_text, read_manifest
+)
+from data_store import (
+    PROCESSED_DIR, derived_path, read_csv_cached, read_data_versions, read_frame, source_name,
+    sources_key, write_json
+)
+from figure_cache import FIGURE_CACHE_BYTES, FigureCache
+from synthetic_data import SCALE_ENV_VAR, read_synthetic_codes, synthetic_paths
+from transport import (
+    GEOJSON_DECIMALS, arrow_bytes, compact_array, compact_figure, compact_geojson, compact_table, transport_key
+)
+from query_engine import ENGINE_DUCKDB, DuckDBEngine, resolve_engine
+from profiling import (
+    NULL_PROFILER, PROFILE_QUERY_PARAM, STAGE_AGGREGATE, STAGE_FIGURE_BUILD, STAGE_FIGURE_SEND,
+    STAGE_FIGURE_SERIALIZE, STAGE_FILTER, STAGE_LOAD, STAGE_TABLE_BUILD, STAGE_TABLE_SEND,
+    RerunProfiler, StageMetrics, configure_logging, is_enabled
+)
+
+# geopandas (con fiona / pyogrio, pyproj y shapely), plotly.express y
+# plotly.graph_objects se importan dentro de las funciones que los usan:
+# el arranque no los paga, y geopandas solo se importa si hay que
+# regenerar las cachés del shapefile
+if TYPE_CHECKING:
+    import geopandas as gpd
+    import plotly.graph_objects as go
+
 # ============================
 # configuración de la app
 # ============================
@@ -18,54 +52,315 @@ BASE_DIR = os.path.dirname(__file__)
 SHP_PATH = os.path.join(BASE_DIR, 'data', 'raw', '50m_cultural', 'ne_50m_admin_0_countries.shp')
 CSV_PATH = os.path.join(BASE_DIR, 'data', 'raw', 'emissions_per_country', 'annual-co2-emissions-per-country.csv')
 CSV_FOSSIL_PATH = os.path.join(BASE_DIR, 'data', 'raw', 'co2-fossil-plus-land-use', 'co2-fossil-plus-land-use.csv')
+CACHE_DIR = PROCESSED_DIR
+
+# modo escala: CO2_SCALE=<nombre> usa los csv generados por synthetic_data.py
+# en data/synthetic/<nombre>/, con su propia caché procesada
+DATA_SCALE = os.environ.get(SCALE_ENV_VAR)
+if DATA_SCALE:
+    scale_paths = synthetic_paths(DATA_SCALE)
+    CSV_PATH = scale_paths['csv']
+    CSV_FOSSIL_PATH = scale_paths['csv_fossil']
+    CACHE_DIR = scale_paths['processed']
+
+# motor de consultas: CO2_QUERY_ENGINE=duckdb consulta las tablas en disco
+# (ver query_engine.py); por defecto, pandas sobre los datos en memoria
+QUERY_ENGINE = resolve_engine()
+
+# precálculo de figuras en otro proceso al arrancar: opcional, con
+# CO2_PRECOMPUTE=1 (sin él, las figuras se construyen al pedirlas y
+# `python precompute.py` las precalcula a mano)
+PRECOMPUTE_ON_START = os.environ.get('CO2_PRECOMPUTE', '0').strip().lower() in ('1', 'true', 'yes')
+
+# hilo de precarga de datos (ver start_warmup)
+WARMUP_THREAD = 'co2-warmup'
+
+# modo estático: CO2_BUNDLE=<carpeta> muestra las figuras y tablas de un
+# paquete generado por export.py, sin cargar datos ni calcular (ver bundle.py)
+BUNDLE_DIR = os.environ.get(BUNDLE_ENV_VAR)
+
+# países preseleccionados en los filtros (si existen en los datos)
+DEFAULT_COUNTRIES = ['China', 'United States', 'India', 'Russia', 'Japan']
+
+# niveles de resolución del mapa: (tolerancia de simplificación en grados, decimales de coordenadas)
+MAP_RESOLUTIONS = {
+    'alta': (None, None),
+    'media': (0.05, 2),
+    'baja': (0.2, 1),
+}
+MAP_RESOLUTION_DEFAULT = 'media'
+
+# cantidad de países en el gráfico de participación regional sin filtro
+REGIONS_TOP_N = 10
+
+# tablas: filas por página (paginación en el servidor) y formatos de columna
+TABLE_PAGE_SIZE = 50
+TONNES_FORMAT = '%,d'
+PERCENT_FORMAT = '%.2f%%'
+
+# formato de las columnas numéricas de cada tabla (ver make_*_table)
+TABLE_FORMATS = {
+    'map': {
+        'Emisiones de CO₂ (toneladas)': TONNES_FORMAT
+    },
+    'countries': {
+        'Emisiones de CO₂ (toneladas)': TONNES_FORMAT
+    },
+    'global': {
+        'Emisiones totales de CO₂ (toneladas)': TONNES_FORMAT
+    },
+    'type': {
+        'Total (toneladas)': TONNES_FORMAT,
+        'Cambio uso suelo (toneladas)': TONNES_FORMAT,
+        'Combustibles fósiles (toneladas)': TONNES_FORMAT
+    },
+    'regions': {
+        'Emisiones de CO₂ (toneladas)': TONNES_FORMAT,
+        'Porcentaje del total (%)': PERCENT_FORMAT
+    },
+}
+
+# columnas de emisiones por tipo (csv de fósiles + cambio de uso de suelo)
+FOSSIL_COLUMNS = ['total', 'land_use_change', 'fossil_fuels']
+
+# clasificación de entidades de owid: países, el agregado mundial y el
+# resto de agregados (continentes, grupos de ingreso, aviación, etc.)
+ENTITY_COUNTRY = 'country'
+ENTITY_WORLD = 'world'
+ENTITY_AGGREGATE = 'aggregate'
+OWID_WORLD_CODE = 'OWID_WRL'
+
+# países con código propio de owid en lugar de iso3: se renombran al
+# código de natural earth para que entren al cubo y al mapa
+OWID_CODE_ALIASES = {'OWID_KOS': 'KOS'}
+
+# territorios que owid publica como país pero no están en el maestro de
+# natural earth (OWID_* de territorios e iso3 sin geometría propia); el
+# resto de los OWID_* y de los códigos fuera del maestro son agregados
+OWID_TERRITORY_CODES = frozenset({'OWID_KOS', 'BES', 'CXR'})
+
+# código de natural earth que falta (p. ej. ISO_A3 de francia y noruega)
+NE_MISSING_CODE = '-99'
+
+# modos del mapa: el servidor genera cada año, o el navegador recibe todos los años juntos
+# (con slider y reproducción dentro del gráfico)
+MAP_MODE_SERVER = 'un año por vez'
+MAP_MODE_BROWSER = 'animación en el navegador'
+
+# años que usabas en el notebook como casos de estudio (atajos del mapa)
+MAP_HIGHLIGHT_YEARS = [1751, 1851, 1951, 2024]
+
+# color de países sin dato y fracción de la escala de color reservada para ellos
+MAP_NO_DATA_COLOR = '#d0d0d0'
+MAP_NO_DATA_FRACTION = 0.01
+
+# sube si cambia cómo se arman las figuras: invalida el almacén de
+# figuras y el mapa animado guardados (ver figure_store_dir)
+FIGURE_FORMAT_VERSION = 3
+
+# milisegundos por año al reproducir la animación del mapa
+MAP_PLAY_FRAME_MS = 150
+
+# marcador del geojson al serializar el mapa (ver make_co2_map_json)
+MAP_GEOJSON_PLACEHOLDER = '__co2_map_geojson__'
+
+# hover del mapa: nombre (hovertext), iso3 y emisiones ya formateadas (text)
+MAP_HOVERTEMPLATE = '<b>%{hovertext}</b><br>code=%{location}<br>co2=%{text}<extra></extra>'
 
 
 
 # ============================
 # carga y preparación de datos
 # ============================
-@st.cache_data
-def load_world(shp_path: str):
+# los loaders usan st.cache_resource: todas las sesiones reciben el mismo
+# objeto (sin copias por llamada), así que se tratan como solo lectura.
+# las tablas de emisiones además se abren con memory map desde
+# data/processed, compartiendo memoria entre procesos
+def ne_country_codes(world: pd.DataFrame) -> pd.Series:
+    """
+    iso3 de cada geometría de natural earth: ISO_A3, o si es -99 el
+    ISO_A3_EH (francia, noruega) mientras no lo use otro país, o el
+    ADM0_A3 (kosovo, somalilandia, territorios). así ningún país se cae
+    del mapa por compartir el -99
+    """
+    iso = world['ISO_A3'].str.upper()
+    eh = world['ISO_A3_EH'].str.upper()
+    adm0 = world['ADM0_A3'].str.upper()
+
+    taken = set(iso[iso != NE_MISSING_CODE])
+    use_eh = (iso == NE_MISSING_CODE) & (eh != NE_MISSING_CODE) & ~eh.isin(taken) & ~eh.duplicated(keep=False)
+    codes = iso.where(iso != NE_MISSING_CODE, eh.where(use_eh, adm0))
+
+    duplicated = codes[codes.duplicated()]
+    if not duplicated.empty:
+        raise ValueError(f'códigos de país repetidos en el shapefile: {sorted(set(duplicated))}')
+
+    return codes
+
+
+@st.cache_resource
+def read_world_shapefile(shp_path: str) -> 'gpd.GeoDataFrame':
     """
-    carga el shapefile de países y construye:
-    - world_master: maestro de países indexado por iso3
-    - geojson_world: geometría en formato geojson para plotly
+    lee el shapefile de países (importa geopandas) y arma el maestro
+    con geometría, una fila por iso3. solo se usa para regenerar las
+    cachés de load_world y load_world_geojson
     """
+    import geopandas as gpd
+
     if not os.path.exists(shp_path):
         raise FileNotFoundError(f'no se encontró el shapefile: {shp_path}')
 
     world = gpd.read_file(shp_path)
+    world['code'] = ne_country_codes(world)
 
-    # estandarizar columna iso3
-    world = world.rename(columns={'ISO_A3': 'code'})
-    world['code'] = world['code'].str.upper()
-
-    # maestro de países: una sola fila por code
-    world_master = (
-        world[['code', 'NAME', 'geometry']]
-        .drop_duplicates(subset=['code'])
-        .rename(columns={'NAME': 'country'})
+    # maestro de países: una fila por code (ne_code es único en natural earth)
+    return (
+        world[['code', 'NAME', 'ADM0_A3', 'geometry']]
+        .rename(columns={'NAME': 'country', 'ADM0_A3': 'ne_code'})
         .set_index('code')
     )
 
-    geojson_world = world_master['geometry'].__geo_interface__
 
-    return world_master, geojson_world
+@st.cache_resource
+def load_world(shp_path: str) -> pd.DataFrame:
+    """
+    maestro de países indexado por iso3 (columnas country, nombre en
+    natural earth, y ne_code, su ADM0_A3), en el orden de las geometrías
+    de load_world_geojson. se lee de data/processed
+    sin importar geopandas; el shapefile solo se lee si cambió
+    """
+    if not os.path.exists(shp_path):
+        raise FileNotFoundError(f'no se encontró el shapefile: {shp_path}')
+
+    path = derived_path(
+        'world_master',
+        [shp_path],
+        lambda: read_world_shapefile(shp_path)[['country', 'ne_code']].reset_index()
+    )
+
+    return read_frame(path).set_index('code')
 
 
-@st.cache_data
-def load_emissions(csv_path: str) -> pd.DataFrame:
+def simplify_geometries(geometries: 'gpd.GeoSeries', tolerance: float, decimals: int) -> 'gpd.GeoSeries':
     """
-    carga el csv de emisiones y lo deja listo para usar
-    con columnas: country, code, year, co2
+    simplifica las geometrías preservando la topología compartida
+    entre países vecinos y cuantiza las coordenadas a `decimals`
     """
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f'no se encontró el csv de emisiones: {csv_path}')
+    import geopandas as gpd
+    import shapely
+
+    try:
+        # simplificación de cobertura: las fronteras compartidas se simplifican igual en ambos lados
+        simplified = shapely.coverage_simplify(geometries.values, tolerance)
+    except (AttributeError, shapely.errors.UnsupportedGEOSVersionError):
+        # geos < 3.12: simplificación por geometría
+        simplified = shapely.simplify(geometries.values, tolerance, preserve_topology=True)
+
+    quantized = shapely.transform(simplified, lambda coords: np.round(coords, decimals))
+
+    return gpd.GeoSeries(quantized, index=geometries.index, crs=geometries.crs)
+
+
+def build_world_geojson(shp_path: str, resolution: str = MAP_RESOLUTION_DEFAULT) -> dict:
+    """
+    geojson de países en el nivel de resolución pedido (ver MAP_RESOLUTIONS),
+    compactado para el navegador (ver transport.compact_geojson). 'alta' es
+    el 50m original con las coordenadas a GEOJSON_DECIMALS decimales
+    """
+    if resolution not in MAP_RESOLUTIONS:
+        raise ValueError(f'resolución de mapa desconocida: {resolution}')
+
+    geometries = read_world_shapefile(shp_path)['geometry']
+    tolerance, decimals = MAP_RESOLUTIONS[resolution]
+    if tolerance is not None:
+        geometries = simplify_geometries(geometries, tolerance, decimals)
+
+    return compact_geojson(geometries.__geo_interface__, GEOJSON_DECIMALS if decimals is None else decimals)
+
+
+def world_geojson_path(shp_path: str, resolution: str = MAP_RESOLUTION_DEFAULT) -> str:
+    """
+    ruta del geojson de países ya serializado en data/processed (ver
+    build_world_geojson). solo se importa geopandas si cambió el shapefile
+    """
+    return derived_path(
+        f'world_geojson_{resolution}',
+        [shp_path],
+        lambda: build_world_geojson(shp_path, resolution),
+        suffix='json',
+        write=write_json,
+        params=(transport_key(),)
+    )
+
+
+@st.cache_resource
+def load_world_geojson(shp_path: str, resolution: str = MAP_RESOLUTION_DEFAULT) -> dict:
+    """
+    geometría de países en formato geojson para plotly (ver world_geojson_path)
+    """
+    with open(world_geojson_path(shp_path, resolution), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@st.cache_resource
+def load_world_geojson_text(shp_path: str, resolution: str = MAP_RESOLUTION_DEFAULT) -> str:
+    """
+    el mismo geojson sin decodificar, para insertarlo en el json de una
+    figura (ver make_co2_map_json)
+    """
+    with open(world_geojson_path(shp_path, resolution), encoding='utf-8') as f:
+        return f.read()
+
+
+def load_world_codes(shp_path: str) -> frozenset:
+    """
+    índice de códigos de país: los iso3 del maestro de natural earth
+    (code y ne_code de load_world, ya en caché) más OWID_TERRITORY_CODES
+    y, en modo escala, los códigos de los países sintéticos
+    """
+    world = load_world(shp_path)
+    codes = frozenset(world.index) | frozenset(world['ne_code']) | OWID_TERRITORY_CODES
+
+    if DATA_SCALE:
+        codes |= read_synthetic_codes(DATA_SCALE)
+
+    return codes
+
+
+def classify_entities(codes: pd.Series, world_codes: frozenset) -> pd.Series:
+    """
+    clasifica cada fila de owid según su código:
+    - ENTITY_WORLD: OWID_WRL, el total mundial precalculado por owid
+    - ENTITY_COUNTRY: códigos del índice `world_codes` (ver load_world_codes)
+    - ENTITY_AGGREGATE: todo lo demás: sin código (continentes, grupos de
+      ingreso, aviación y transporte marítimo internacional, regiones
+      GCP) y los OWID_* que no son territorios
+    """
+    codes = codes.astype(object).fillna('').astype(str).str.upper()
+
+    is_world = codes == OWID_WORLD_CODE
+    is_country = codes.isin(world_codes) & ~is_world
+
+    kind = np.where(
+        is_world,
+        ENTITY_WORLD,
+        np.where(is_country, ENTITY_COUNTRY, ENTITY_AGGREGATE)
+    )
+
+    return pd.Series(
+        pd.Categorical(kind, categories=[ENTITY_COUNTRY, ENTITY_WORLD, ENTITY_AGGREGATE]),
+        index=codes.index,
+        name='kind'
+    )
 
-    df = pd.read_csv(csv_path)
 
+def prepare_emissions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    deja el csv de emisiones listo para usar
+    con columnas: country, code, year, co2
+    """
     df = df.rename(columns={'Entity': 'country', 'Code': 'code', 'Year': 'year'})
-    df['code'] = df['code'].str.upper()
+    df['code'] = df['code'].str.upper().replace(OWID_CODE_ALIASES)
 
     # filtrar a códigos iso válidos
     df = df[df['code'].str.len() == 3]
@@ -80,16 +375,182 @@ def load_emissions(csv_path: str) -> pd.DataFrame:
     return df[['country', 'code', 'year', 'co2']]
 
 
-@st.cache_data
-def load_fossil_emissions(csv_path: str) -> pd.DataFrame:
+def emissions_path(csv_path: str) -> str:
     """
-    carga el csv de emisiones fósiles y cambio de uso de suelo
+    ruta del feather con el csv de emisiones ya preparado
+    (ver prepare_emissions), regenerado si cambia el csv
     """
     if not os.path.exists(csv_path):
-        raise FileNotFoundError(f'no se encontró el csv de emisiones fósiles: {csv_path}')
+        raise FileNotFoundError(f'no se encontró el csv de emisiones: {csv_path}')
 
-    df = pd.read_csv(csv_path)
-    
+    return derived_path(
+        'emissions',
+        [csv_path],
+        lambda: prepare_emissions(read_csv_cached(csv_path, CACHE_DIR)),
+        CACHE_DIR
+    )
+
+
+@st.cache_resource(max_entries=1)
+def load_emissions(csv_path: str, version: int = 0) -> pd.DataFrame:
+    """
+    carga el csv de emisiones ya preparado como tabla compartida
+    de solo lectura.
+    version: número de ingesta del csv (ver data_versions); solo forma
+    parte de la clave de caché
+    """
+    return read_frame(emissions_path(csv_path))
+
+
+@st.cache_resource(max_entries=1)
+def load_emissions_cube(csv_path: str, version: int = 0) -> dict:
+    """
+    construye una sola vez por proceso un cubo denso año × país
+    a partir del csv de emisiones:
+    - years / codes / countries: ejes del cubo (ordenados)
+    - values: arreglo numpy 2-d (año, país), nan donde no hay dato
+    - shares: porcentaje de cada país sobre el total del año (año, país)
+    - prefix / count_prefix: sumas acumuladas por año de values y de la
+      cantidad de años con dato, con una fila inicial de ceros, para
+      sumar cualquier rango de años con una resta
+    - year_index / code_index / country_index: búsqueda de posición por
+      año, iso3 y nombre de país. la columna de un país es su country_id
+      (ver country_table): los filtros por país indexan columnas
+    - country_dtype: tipo categórico de la columna country del csv, para
+      devolver tablas con el mismo tipo que el motor duckdb
+    (version: ver load_emissions)
+    """
+    df = load_emissions(csv_path, version)
+
+    years = np.sort(df['year'].unique())
+    codes = np.sort(df['code'].unique())
+
+    year_pos = np.searchsorted(years, df['year'].to_numpy())
+    code_pos = np.searchsorted(codes, df['code'].to_numpy())
+
+    # sumar filas repetidas (año, país) y marcar celdas sin dato como nan
+    values = np.zeros((len(years), len(codes)), dtype='float64')
+    np.add.at(values, (year_pos, code_pos), df['co2'].to_numpy(dtype='float64'))
+    has_data = np.zeros(values.shape, dtype=bool)
+    has_data[year_pos, code_pos] = True
+    values[~has_data] = np.nan
+
+    # participación en el total de cada año y sumas acumuladas
+    filled = np.where(has_data, values, 0.0)
+    year_totals = filled.sum(axis=1, keepdims=True)
+    shares = np.where(has_data, values / np.where(year_totals > 0, year_totals, 1.0) * 100, np.nan)
+
+    prefix = np.zeros((len(years) + 1, len(codes)), dtype='float64')
+    np.cumsum(filled, axis=0, out=prefix[1:])
+    count_prefix = np.zeros((len(years) + 1, len(codes)), dtype='int64')
+    np.cumsum(has_data, axis=0, out=count_prefix[1:])
+
+    # compartido entre sesiones: solo lectura
+    for arr in (values, shares, prefix, count_prefix):
+        arr.flags.writeable = False
+
+    # nombre de país por iso3 (el primero que aparece en el csv)
+    countries = (
+        df.drop_duplicates(subset=['code'])
+        .set_index('code')['country']
+        .reindex(codes)
+        .astype(str)
+        .to_numpy(dtype=object)
+    )
+
+    return {
+        'years': years,
+        'codes': codes,
+        'countries': countries,
+        'values': values,
+        'shares': shares,
+        'prefix': prefix,
+        'count_prefix': count_prefix,
+        'year_index': {int(y): i for i, y in enumerate(years)},
+        'code_index': {c: j for j, c in enumerate(codes)},
+        'country_index': {c: j for j, c in enumerate(countries)},
+        'country_dtype': df['country'].dtype,
+    }
+
+
+def cube_year(cube: dict, year: int) -> np.ndarray:
+    """
+    devuelve la fila del cubo para un año (una posición por iso3),
+    o una fila de nan si el año no está en el cubo
+    """
+    i = cube['year_index'].get(int(year))
+    if i is None:
+        return np.full(len(cube['codes']), np.nan)
+    return cube['values'][i]
+
+
+def cube_year_span(cube: dict, year_range: tuple) -> slice:
+    """
+    posiciones del cubo (filas) de los años dentro de year_range, inclusive
+    """
+    years = cube['years']
+    return slice(
+        int(np.searchsorted(years, year_range[0], side='left')),
+        int(np.searchsorted(years, year_range[1], side='right'))
+    )
+
+
+def cube_top_countries(cube: dict, year_range: tuple, n: int) -> np.ndarray:
+    """
+    posiciones de los n países con más emisiones acumuladas en year_range
+    (solo países con algún dato en el rango). la suma de cada país es una
+    resta de sumas acumuladas, sin recorrer los años
+    """
+    span = cube_year_span(cube, year_range)
+    totals = cube['prefix'][span.stop] - cube['prefix'][span.start]
+    present = (cube['count_prefix'][span.stop] - cube['count_prefix'][span.start]) > 0
+
+    order = np.argsort(-totals, kind='stable')
+    return order[present[order]][:n]
+
+
+def cube_regional_shares(cube: dict, year_range: tuple, columns: np.ndarray):
+    """
+    participación porcentual de los países `columns` (posiciones del cubo)
+    en year_range:
+    - pivot: índice year, una columna por país, 0 donde no hay dato
+    - rows: formato largo (year, country, co2, percentage), solo celdas con dato
+    ambos son cortes numpy del cubo; se omiten años sin dato en ningún país
+    """
+    span = cube_year_span(cube, year_range)
+    years = cube['years'][span]
+    shares = cube['shares'][span][:, columns]
+    values = cube['values'][span][:, columns]
+    names = cube['countries'][columns]
+
+    has_data = ~np.isnan(shares)
+    keep = has_data.any(axis=1)
+
+    pivot = pd.DataFrame(
+        np.where(has_data, shares, 0.0)[keep],
+        index=pd.Index(years[keep], name='year'),
+        columns=pd.Index(names, name='country')
+    )
+    # columnas en orden alfabético, como pivot_table
+    pivot = pivot.sort_index(axis=1)
+
+    year_pos, col_pos = np.nonzero(has_data)
+    rows = pd.DataFrame({
+        'year': years[year_pos],
+        'country': names[col_pos],
+        'co2': values[year_pos, col_pos],
+        'percentage': shares[year_pos, col_pos]
+    })
+
+    return pivot, rows
+
+
+def prepare_fossil_emissions(df: pd.DataFrame, world_codes: frozenset) -> pd.DataFrame:
+    """
+    deja listo el csv de emisiones fósiles y cambio de uso de suelo,
+    con la columna kind (ver classify_entities) para separar países
+    de agregados
+    """
     df = df.rename(columns={
         'Entity': 'country',
         'Code': 'code',
@@ -99,814 +560,2134 @@ def load_fossil_emissions(csv_path: str) -> pd.DataFrame:
         'Annual CO₂ emissions': 'fossil_fuels'
     })
     
-    df = df.drop(columns=['code'], errors='ignore')
+    df['kind'] = classify_entities(df['code'], world_codes)
     
     return df
 
 
-# ============================
-# lógica de visualización
-# ============================
-def make_co2_map(df_co2: pd.DataFrame,
-                 world_master: gpd.GeoDataFrame,
-                 geojson_world: dict,
-                 year: int):
+def fossil_emissions_path(csv_path: str, shp_path: str = SHP_PATH) -> str:
     """
-    genera el mapa de emisiones de co₂ por país para un año dado.
-    respeta tu lógica original, pero preparado para streamlit.
+    ruta del feather con el csv de emisiones fósiles y cambio de uso de
+    suelo ya preparado (ver prepare_fossil_emissions)
     """
-    # emisiones del año seleccionado, agregadas por país
-    co2_year = (
-        df_co2[df_co2['year'] == year][['code', 'co2']]
-        .groupby('code', as_index=False)
-        .agg({'co2': 'sum'})
-        .set_index('code')
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f'no se encontró el csv de emisiones fósiles: {csv_path}')
+
+    return derived_path(
+        'fossil_emissions',
+        [csv_path, shp_path],
+        lambda: prepare_fossil_emissions(read_csv_cached(csv_path, CACHE_DIR), load_world_codes(shp_path)),
+        CACHE_DIR,
+        params=tuple(sorted(OWID_TERRITORY_CODES))
     )
 
-    # unir al maestro: aquí nunca se pierden países
-    world_y = world_master.join(co2_year, how='left')
-
-    # países con dato vs sin dato
-    g_with = world_y[world_y['co2'].notna()].reset_index()
-    g_no = world_y[world_y['co2'].isna()].reset_index()
-
-    # capa 1: países con dato → escala continua
-    fig = px.choropleth(
-        g_with,
-        geojson=geojson_world,
-        locations='code',            # usa el iso3
-        color='co2',
-        hover_name='country',
-        projection='natural earth',
-        color_continuous_scale='Reds'
-    )
-
-    # capa 2: países sin dato → gris, sin leyenda
-    if not g_no.empty:
-        fig_grey = px.choropleth(
-            g_no,
-            geojson=geojson_world,
-            locations='code',
-            color_discrete_sequence=['#d0d0d0'],
-            hover_name='country',
-            projection='natural earth'
-        )
-        for trace in fig_grey.data:
-            trace.showlegend = False
-            fig.add_trace(trace)
 
-    fig.update_geos(fitbounds='locations', visible=False)
-    fig.update_layout(
-        title_text=f'emisiones de co₂ por país en {year}',
-        title_x=0.5,
-        height=600
+@st.cache_resource(max_entries=1)
+def load_fossil_emissions(csv_path: str, shp_path: str = SHP_PATH, version: int = 0) -> pd.DataFrame:
+    """
+    carga el csv de emisiones fósiles y cambio de uso de suelo
+    como tabla compartida de solo lectura (version: ver load_emissions)
+    """
+    return read_frame(fossil_emissions_path(csv_path, shp_path))
+
+
+@st.cache_resource(max_entries=1)
+def load_fossil_index(csv_path: str, version: int = 0) -> dict:
+    """
+    índice de sumas acumuladas de las emisiones por tipo, construido una
+    vez por proceso:
+    - years / year_index: años del csv (ordenados) y su posición
+    - totals: totales mundiales por año (year + FOSSIL_COLUMNS)
+    - cumulative: suma acumulada de totals, arreglo (año, tipo)
+    - countries / country_index: países del csv y su posición
+    - country_cumulative: suma acumulada por país, arreglo (año, país, tipo)
+
+    solo se suman filas de países; los agregados de owid se descartan.
+    el total mundial usa la fila World de owid donde existe y la suma
+    de países solo donde World no tiene dato (version: ver load_emissions)
+    """
+    df = load_fossil_emissions(csv_path, version=version)
+    df_countries = df[df['kind'] == ENTITY_COUNTRY]
+    df_world = df[df['kind'] == ENTITY_WORLD]
+
+    years = np.sort(df['year'].unique())
+    countries = np.sort(df_countries['country'].astype(str).unique())
+
+    year_pos = np.searchsorted(years, df_countries['year'].to_numpy())
+    country_pos = np.searchsorted(countries, df_countries['country'].astype(str).to_numpy())
+
+    # emisiones por (año, país, tipo); los nan no suman, igual que groupby().sum()
+    by_country = np.zeros((len(years), len(countries), len(FOSSIL_COLUMNS)), dtype='float64')
+    np.add.at(
+        by_country,
+        (year_pos, country_pos),
+        np.nan_to_num(df_countries[FOSSIL_COLUMNS].to_numpy(dtype='float64'))
+    )
+
+    # total mundial: fila World de owid, o suma de países donde falta
+    by_year = by_country.sum(axis=1)
+    world = np.full(by_year.shape, np.nan)
+    world[np.searchsorted(years, df_world['year'].to_numpy())] = df_world[FOSSIL_COLUMNS].to_numpy(dtype='float64')
+    by_year = np.where(np.isnan(world), by_year, world)
+    totals = pd.DataFrame(by_year, columns=FOSSIL_COLUMNS)
+    totals.insert(0, 'year', years)
+
+    cumulative = np.cumsum(by_year, axis=0)
+    country_cumulative = np.cumsum(by_country, axis=0)
+    for arr in (cumulative, country_cumulative):
+        arr.flags.writeable = False
+
+    return {
+        'years': years,
+        'year_index': {int(y): i for i, y in enumerate(years)},
+        'totals': totals,
+        'cumulative': cumulative,
+        'countries': countries,
+        'country_index': {c: j for j, c in enumerate(countries)},
+        'country_cumulative': country_cumulative,
+    }
+
+
+def fossil_cumulative(index: dict, year: int, country: str = None) -> dict:
+    """
+    emisiones por tipo acumuladas hasta `year` inclusive (global o de un
+    país), como {tipo: toneladas}. es una lectura del prefijo acumulado
+    """
+    i = int(np.searchsorted(index['years'], year, side='right')) - 1
+    if i < 0:
+        return dict.fromkeys(FOSSIL_COLUMNS, 0.0)
+
+    if country is None:
+        row = index['cumulative'][i]
+    else:
+        row = index['country_cumulative'][i, index['country_index'][country]]
+
+    return dict(zip(FOSSIL_COLUMNS, row.tolist()))
+
+
+@st.cache_resource(max_entries=1)
+def load_query_engine(csv_path: str, csv_fossil_path: str, engine: str = QUERY_ENGINE, versions: tuple = (0, 0)):
+    """
+    motor de consultas fuera de memoria sobre las tablas derivadas, o
+    None para usar las consultas pandas sobre los datos en memoria.
+    versions: versiones de los dos csv (ver load_emissions); cada versión
+    tiene sus propias tablas derivadas, así que el motor se vuelve a crear
+    """
+    if engine != ENGINE_DUCKDB:
+        return None
+
+    return DuckDBEngine(
+        emissions_path(csv_path),
+        fossil_emissions_path(csv_fossil_path),
+        FOSSIL_COLUMNS,
+        country_kind=ENTITY_COUNTRY,
+        world_kind=ENTITY_WORLD
     )
 
-    return fig
 
 
 # ============================
-# app principal
+# registro de datos por pestaña
 # ============================
-def main():
-    st.title('mapa interactivo de emisiones de co₂')
-    st.markdown(
-        """
-        esta aplicación muestra las emisiones anuales de co₂ por país usando datos de our world in data.
-        puedes explorar distintos años y comparar cómo cambia el mapa a lo largo del tiempo.
-        """
-    )
+# cada pestaña declara qué datos usa: se cargan al primer acceso y el
+# resto se precarga en segundo plano (ver start_warmup). cada loader
+# recibe las versiones de los csv (ver data_versions)
+DATASETS = {
+    'emissions': lambda v: load_emissions(CSV_PATH, v[CSV_PATH]),
+    'cube': lambda v: load_emissions_cube(CSV_PATH, v[CSV_PATH]),
+    'fossil_index': lambda v: load_fossil_index(CSV_FOSSIL_PATH, v[CSV_FOSSIL_PATH]),
+    'engine': lambda v: load_query_engine(CSV_PATH, CSV_FOSSIL_PATH, versions=(v[CSV_PATH], v[CSV_FOSSIL_PATH])),
+    'map_assets': lambda v: load_map_assets(CSV_PATH, SHP_PATH, v[CSV_PATH]),
+    'geojson': lambda v: load_world_geojson(SHP_PATH, MAP_RESOLUTION_DEFAULT),
+}
 
-    # cargar datos
-    with st.spinner('Cargando datos geoespaciales y de emisiones...'):
-        world_master, geojson_world = load_world(SHP_PATH)
-        df_co2 = load_emissions(CSV_PATH)
-        df_fossil = load_fossil_emissions(CSV_FOSSIL_PATH)
+# la geometría del mapa ('geojson') solo se usa al construir la figura,
+# que puede venir de la caché de figuras
+TAB_DATASETS = {
+    'Mapa por país': ['cube', 'map_assets', 'engine'],
+    'Evolución temporal': ['cube', 'engine'],
+    'Emisiones por tipo': ['fossil_index', 'engine'],
+    'Evolución por región': ['cube', 'engine'],
+    'Documentación': [],
+}
 
-    # selector de visualización en sidebar
-    st.sidebar.header('Navegación')
-    selected_tab = st.sidebar.radio(
-        'Selecciona una visualización:',
-        ['Mapa por país', 'Evolución temporal', 'Emisiones por tipo', 'Evolución por región', 'Documentación'],
-        label_visibility='collapsed'
-    )
-    
-    # mostrar controles según la pestaña seleccionada
-    if selected_tab == 'Mapa por país':
-        st.sidebar.markdown('---')
-        st.sidebar.header('controles')
-
-        min_year = int(df_co2['year'].min())
-        max_year = int(df_co2['year'].max())
-
-        # años que usabas en el notebook como casos de estudio
-        años_destacados = [1751, 1851, 1951, 2024]
-        años_destacados = [a for a in años_destacados if min_year <= a <= max_year]
-
-        preset = st.sidebar.selectbox(
-            'años destacados',
-            options=['ninguno'] + [str(a) for a in años_destacados],
-            index=0
-        )
 
-        if preset != 'ninguno':
-            year_default = int(preset)
-        else:
-            year_default = max_year
-
-        year = st.sidebar.slider(
-            'año',
-            min_value=min_year,
-            max_value=max_year,
-            value=year_default,
-            step=1
-        )
+def data_versions() -> dict:
+    """
+    versión de cada csv fuente, {ruta: versión}, según la última ingesta
+    incremental (ver ingest.py). se lee en cada rerun (un json chico):
+    los loaders la reciben como parte de la clave de caché, así que tras
+    una ingesta la siguiente ejecución recarga solo los datos del csv que
+    cambió, sin reiniciar la app
+    """
+    sources = read_data_versions(CACHE_DIR)
+    return {
+        path: sources.get(source_name(path), {}).get('version', 0)
+        for path in (CSV_PATH, CSV_FOSSIL_PATH)
+    }
 
-        st.sidebar.markdown(
-            """
-            usa el slider para moverte año a año y el selector de
-            años destacados para saltar rápidamente a hitos históricos.
-            """
-        )
-    
-    elif selected_tab == 'Evolución temporal':
-        # calcular totales por año para los controles
-        df_total_year = (
-            df_co2.groupby('year', as_index=False)
-            .agg({'co2': 'sum'})
-            .rename(columns={'co2': 'co2_total'})
-        )
-        
-        st.sidebar.markdown('---')
-        st.sidebar.header('Controles de rango temporal')
-        
-        min_year_global = int(df_total_year['year'].min())
-        max_year_global = int(df_total_year['year'].max())
-        
-        year_range = st.sidebar.slider(
-            'Rango de años',
-            min_value=min_year_global,
-            max_value=max_year_global,
-            value=(min_year_global, max_year_global),
-            step=1,
-            help='Selecciona el rango de años para visualizar en el gráfico'
-        )
-        
-        st.sidebar.markdown('---')
-        st.sidebar.header('Filtro de países')
-        
-        # obtener lista de países disponibles
-        available_countries = sorted(df_co2['country'].unique())
-        
-        # checkbox para activar/desactivar filtro
-        filter_countries = st.sidebar.checkbox(
-            'Filtrar por países específicos',
-            value=False,
-            help='Activa para seleccionar países individuales'
-        )
-        
-        if filter_countries:
-            selected_countries = st.sidebar.multiselect(
-                'Selecciona países',
-                options=available_countries,
-                default=['China', 'United States', 'India', 'Russia', 'Japan'],
-                help='Puedes seleccionar múltiples países'
-            )
-        else:
-            selected_countries = None
-    
-    elif selected_tab == 'Emisiones por tipo':
-        # calcular emisiones por tipo para los controles
-        df_emissions_ctrl = (
-            df_fossil.groupby('year', as_index=False)
-            .agg({
-                'total': 'sum',
-                'land_use_change': 'sum',
-                'fossil_fuels': 'sum'
-            })
-        )
-        
-        years_ctrl = sorted(df_emissions_ctrl['year'].unique())
-        
-        st.sidebar.markdown('---')
-        st.sidebar.header('Controles de año')
-        
-        year_selected = st.sidebar.slider(
-            'Acumular hasta año',
-            min_value=int(years_ctrl[0]),
-            max_value=int(years_ctrl[-1]),
-            value=2024 if 2024 in years_ctrl else int(years_ctrl[-1]),
-            step=1,
-            help='Selecciona hasta qué año se acumulan las emisiones'
-        )
-    
-    elif selected_tab == 'Evolución por región':
-        # calcular años disponibles para los controles
-        years_regions = sorted(df_co2['year'].unique())
-        
-        st.sidebar.markdown('---')
-        st.sidebar.header('Controles de rango temporal')
-        
-        year_range = st.sidebar.slider(
-            'Rango de años',
-            min_value=int(years_regions[0]),
-            max_value=int(years_regions[-1]),
-            value=(int(years_regions[0]), int(years_regions[-1])),
-            step=1,
-            help='Selecciona el rango de años para visualizar en el gráfico'
-        )
-        
-        st.sidebar.markdown('---')
-        st.sidebar.header('Filtro de países')
-        
-        # obtener lista de países disponibles
-        available_countries_regions = sorted(df_co2['country'].unique())
-        
-        # checkbox para activar/desactivar filtro
-        filter_countries_regions = st.sidebar.checkbox(
-            'Filtrar por países específicos',
-            value=False,
-            help='Activa para seleccionar países individuales en lugar de top 10',
-            key='filter_regions'
-        )
-        
-        if filter_countries_regions:
-            selected_countries_regions = st.sidebar.multiselect(
-                'Selecciona países',
-                options=available_countries_regions,
-                default=['China', 'United States', 'India', 'Russia', 'Japan'],
-                help='Puedes seleccionar múltiples países',
-                key='multiselect_regions'
-            )
-        else:
-            selected_countries_regions = None
-    
-    # renderizar contenido según la selección
-    if selected_tab == 'Mapa por país':
-        st.header("Emisiones de CO₂ por país")
 
-        # generar mapa
-        if year < min_year or year > max_year:
-            st.warning(f'no hay datos para el año {year}. el rango válido es {min_year}–{max_year}.')
-            return
+def load_tab_data(tab: str, versions: dict) -> dict:
+    """
+    datos que usa una pestaña, {nombre: objeto}, cargados (o leídos de
+    la caché de recursos) en el orden declarado
+    """
+    return {name: DATASETS[name](versions) for name in TAB_DATASETS[tab]}
 
-        with st.spinner(f'Generando mapa para el año {year}...'):
-            fig = make_co2_map(df_co2, world_master, geojson_world, year)
-            st.plotly_chart(fig, use_container_width=True)
 
-        # tabla resumen opcional
-        st.markdown('---')
-        st.subheader('tabla de emisiones por país en el año seleccionado')
+class WarmupContextFilter(logging.Filter):
+    """
+    descarta el aviso "missing ScriptRunContext" de streamlit en el hilo
+    de precarga, que corre sin sesión a propósito (ver start_warmup)
+    """
 
-        df_year = (
-            df_co2[df_co2['year'] == year][['country', 'code', 'co2']]
-            .groupby(['country', 'code'], as_index=False)
-            .agg({'co2': 'sum'})
-            .sort_values('co2', ascending=False)
-        )
-        
-        # agregar ranking
-        df_year.insert(0, 'Ranking', range(1, len(df_year) + 1))
-        df_year.columns = ['Ranking', 'País', 'Código ISO3', 'Emisiones de CO₂ (toneladas)']
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not (record.threadName == WARMUP_THREAD and 'missing ScriptRunContext' in record.getMessage())
 
+
+@st.cache_resource(max_entries=1)
+def start_warmup(versions: dict) -> dict:
+    """
+    lanza un hilo que precarga todos los datos: una vez por proceso y de
+    nuevo con cada versión de datos (ver data_versions).
+    el hilo no se asocia a la sesión que lo lanzó (vive lo que el
+    proceso, y esa sesión puede cerrarse antes): solo llama a loaders
+    cacheados, que no dibujan nada. los loaders se comparten con las
+    sesiones: si una sesión pide un dato que el hilo está cargando,
+    espera a que termine en vez de cargarlo de nuevo. devuelve el estado
+    de cada dato (se actualiza mientras el hilo avanza). con
+    CO2_PRECOMPUTE=1, al terminar lanza el precálculo de figuras (ver
+    precompute.py)
+    """
+    status = dict.fromkeys(DATASETS, 'pendiente')
+
+    def warm():
+        for name, load in DATASETS.items():
+            status[name] = 'cargando'
+            try:
+                load(versions)
+                status[name] = 'listo'
+            except Exception as e:
+                # el error se repite (y se muestra) cuando una pestaña pide el dato
+                status[name] = f'error: {e}'
+
+        # con los datos en data/processed, las figuras se precalculan en otro
+        # proceso (un núcleo queda libre para el servidor)
+        if PRECOMPUTE_ON_START:
+            from precompute import available_cores, start_background
+
+            start_background(max(1, available_cores() - 1))
+
+    context_logger = logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context')
+    if not any(isinstance(f, WarmupContextFilter) for f in context_logger.filters):
+        context_logger.addFilter(WarmupContextFilter())
+
+    thread = threading.Thread(target=warm, name=WARMUP_THREAD, daemon=True)
+    thread.start()
+
+    return status
+
+# ============================
+# lógica de visualización
+# ============================
+def map_colorscale(name: str = 'Reds') -> list:
+    """
+    escala continua de plotly con un tramo inicial gris, en escalón, para
+    los países sin dato (ver map_frame_values)
+    """
+    from plotly.colors import get_colorscale
+
+    f = MAP_NO_DATA_FRACTION
+    scale = get_colorscale(name)
+
+    return [[0.0, MAP_NO_DATA_COLOR], [f, MAP_NO_DATA_COLOR]] + [
+        [f + (1 - f) * pos, color] for pos, color in scale
+    ]
+
+
+def map_frame_values(values: np.ndarray):
+    """
+    convierte las emisiones de un arreglo (año, país), nan = sin dato, en
+    z / zmin / zmax / text de la traza choropleth con map_colorscale, una
+    fila por año en una sola pasada. los nan se reemplazan por un valor
+    centinela que cae en el tramo gris, por debajo del rango de datos.
+    el rango empieza en 0 (o en el mínimo, si hay valores negativos): las
+    marcas de la barra de color son múltiplos de su paso, mucho mayor que
+    el tramo gris, así que ninguna cae en él
+    """
+    has_data = ~np.isnan(values)
+
+    lo = np.where(has_data, values, np.inf).min(axis=1)
+    hi = np.where(has_data, values, -np.inf).max(axis=1)
+
+    # años sin ningún dato: escala 0-1 y todo el mapa en gris
+    empty = ~has_data.any(axis=1)
+    lo[empty] = 0.0
+    hi[empty] = 1.0
+    lo = np.minimum(lo, 0.0)
+    span = np.where(hi > lo, hi - lo, 1.0)
+
+    # centinela tal que (lo - centinela) / (hi - centinela) = MAP_NO_DATA_FRACTION
+    f = MAP_NO_DATA_FRACTION
+    sentinel = lo - span * f / (1 - f)
+
+    text = np.full(values.shape, 'sin dato', dtype=object)
+    text[has_data] = [f'{v:,.0f}' for v in values[has_data]]
+
+    return np.where(has_data, values, sentinel[:, None]), sentinel, lo + span, text
+
+
+def country_table(cube: dict, world_master: pd.DataFrame) -> pd.DataFrame:
+    """
+    tabla de correspondencia de países, una fila por iso3 del csv o del
+    shapefile:
+    - country_id: id entero del país, su columna en el cubo año × país
+      (-1 si no tiene datos en owid)
+    - iso3 / owid_name: código (ya con OWID_CODE_ALIASES) y nombre en owid
+    - ne_code / ne_name / ne_order: ADM0_A3, nombre y posición de la
+      geometría en natural earth (vacíos y -1 si no tiene geometría)
+    los joins entre mapa, cubo y tablas se hacen una vez acá; el resto de
+    la app indexa arreglos con country_id
+    """
+    owid = pd.DataFrame({
+        'iso3': cube['codes'],
+        'country_id': np.arange(len(cube['codes']), dtype='int32'),
+        'owid_name': cube['countries'],
+    })
+    ne = pd.DataFrame({
+        'iso3': world_master.index.to_numpy(dtype=object),
+        'ne_code': world_master['ne_code'].to_numpy(dtype=object),
+        'ne_name': world_master['country'].to_numpy(dtype=object),
+        'ne_order': np.arange(len(world_master), dtype='int32'),
+    })
+
+    table = owid.merge(ne, on='iso3', how='outer', sort=True)
+    for col in ('country_id', 'ne_order'):
+        table[col] = table[col].fillna(-1).astype('int32')
+
+    return table[['country_id', 'iso3', 'owid_name', 'ne_code', 'ne_name', 'ne_order']]
+
+
+def map_labels(countries: pd.DataFrame) -> dict:
+    """
+    parte fija del mapa, en el orden de las geometrías (ver
+    country_table): iso3, nombre de país para el hover y country_id de
+    cada geometría (-1 si no tiene datos)
+    """
+    shapes = countries[countries['ne_order'] >= 0].sort_values('ne_order')
+
+    return {
+        'locations': shapes['iso3'].tolist(),
+        'hovertext': shapes['ne_name'].tolist(),
+        'positions': shapes['country_id'].tolist(),
+    }
+
+
+def map_assets(cube: dict, labels: dict) -> dict:
+    """
+    arreglos del mapa alineados con el orden fijo de `labels`: las
+    emisiones (año, país) con nan donde no hay dato y, para cada año,
+    z / zmin / zmax / text ya listos para la traza. cambiar de año es
+    tomar una fila, sin join ni reindexado
+    """
+    positions = np.array(labels['positions'], dtype='int64')
+    values = cube['values'][:, np.maximum(positions, 0)]
+    values[:, positions < 0] = np.nan
+
+    z, zmin, zmax, text = map_frame_values(values)
+
+    return {
+        'locations': np.array(labels['locations'], dtype=object),
+        'hovertext': np.array(labels['hovertext'], dtype=object),
+        'years': cube['years'],
+        'year_index': cube['year_index'],
+        'values': values,
+        # z solo define el color (el hover muestra text): basta con float32
+        'z': compact_array(z),
+        'zmin': zmin,
+        'zmax': zmax,
+        'text': text,
+    }
+
+
+@st.cache_resource(max_entries=1)
+def load_country_table(csv_path: str, shp_path: str, version: int = 0) -> pd.DataFrame:
+    """
+    tabla de correspondencia de países (ver country_table), guardada en
+    data/processed con la huella del csv y del shapefile
+    (version: ver load_emissions)
+    """
+    path = derived_path(
+        'country_table',
+        [csv_path, shp_path],
+        lambda: country_table(load_emissions_cube(csv_path, version), load_world(shp_path)),
+        CACHE_DIR
+    )
+
+    return read_frame(path)
+
+
+@st.cache_resource(max_entries=1)
+def load_map_assets(csv_path: str, shp_path: str, version: int = 0) -> dict:
+    """
+    map_assets una vez por proceso. las etiquetas y el orden de países
+    se guardan en data/processed (json, con la huella del csv y del
+    shapefile), así que el mapa no necesita leer world_master
+    (version: ver load_emissions)
+    """
+    cube = load_emissions_cube(csv_path, version)
+    path = derived_path(
+        'map_labels',
+        [csv_path, shp_path],
+        lambda: map_labels(load_country_table(csv_path, shp_path, version)),
+        CACHE_DIR,
+        suffix='json',
+        write=write_json
+    )
+    with open(path, encoding='utf-8') as f:
+        labels = json.load(f)
+
+    return map_assets(cube, labels)
+
+
+def map_base_trace(assets: dict, year: int) -> 'go.Choropleth':
+    """
+    traza choropleth única del mapa: nombres de país y colores del año
+    dado (filas precalculadas de map_assets). la geometría se asigna con
+    set_map_geometry
+    """
+    import plotly.graph_objects as go
+
+    i = assets['year_index'][int(year)]
+
+    return go.Choropleth(
+        locations=assets['locations'],      # usa el iso3
+        hovertext=assets['hovertext'],
+        hovertemplate=MAP_HOVERTEMPLATE,
+        colorscale=map_colorscale(),
+        colorbar=dict(title='co2'),
+        marker_line_width=0.5,
+        z=assets['z'][i],
+        zmin=float(assets['zmin'][i]),
+        zmax=float(assets['zmax'][i]),
+        text=assets['text'][i]
+    )
+
+
+def map_geos(fig: 'go.Figure'):
+    """
+    encuadre del mapa: solo los países de la traza, sin mapa base
+    """
+    fig.update_geos(fitbounds='locations', visible=False, projection_type='natural earth')
+
+
+def set_map_geometry(fig: 'go.Figure', geojson_world: dict):
+    """
+    asigna el geojson a la traza base de una figura ya creada: go.Figure
+    copia en profundidad las trazas que recibe y la geometría es casi todo
+    el peso de la traza. la figura comparte el dict cacheado (solo lectura)
+    """
+    fig.data[0].geojson = geojson_world
+
+
+def make_co2_map(assets: dict,
+                 geojson_world: dict,
+                 year: int):
+    """
+    genera el mapa de emisiones de co₂ por país para un año dado.
+    una sola traza: los países sin dato quedan en el tramo gris de la escala
+    """
+    import plotly.graph_objects as go
+
+    fig = go.Figure(data=[map_base_trace(assets, year)])
+    set_map_geometry(fig, geojson_world)
+
+    map_geos(fig)
+    fig.update_layout(
+        title_text=f'emisiones de co₂ por país en {year}',
+        title_x=0.5,
+        height=600,
+        uirevision='co2-map'
+    )
+
+    return fig
+
+
+def make_co2_map_json(assets: dict, geojson_text: str, year: int) -> str:
+    """
+    make_co2_map ya serializada a json. el codificador de plotly recorre
+    cada coordenada del geojson en python (~0.5 s por figura): la figura
+    se serializa con un marcador en lugar de la geometría y se inserta el
+    geojson ya serializado (load_world_geojson_text)
+    """
+    fig_json = pio.to_json(make_co2_map(assets, MAP_GEOJSON_PLACEHOLDER, year), validate=False)
+
+    return fig_json.replace(f'"{MAP_GEOJSON_PLACEHOLDER}"', geojson_text, 1)
+
+
+def make_co2_map_frames(assets: dict,
+                        geojson_world: dict,
+                        year: int = None):
+    """
+    genera el mapa con todos los años como frames de plotly.
+    la geometría va una sola vez en la traza base; cada frame solo trae
+    el vector de colores y el texto de hover de ese año, y el slider y
+    el botón de reproducción cambian de año en el navegador sin volver
+    al servidor
+    """
+    import plotly.graph_objects as go
+
+    years = assets['years']
+    z, zmin, zmax, text = assets['z'], assets['zmin'], assets['zmax'], assets['text']
+
+    if year is None:
+        year = int(years[-1])
+    active = assets['year_index'][int(year)]
+
+    fig = go.Figure(
+        data=[map_base_trace(assets, year)],
+        frames=[
+            go.Frame(
+                name=str(y),
+                data=[go.Choropleth(z=z[i], zmin=zmin[i], zmax=zmax[i], text=text[i])]
+            )
+            for i, y in enumerate(years)
+        ]
+    )
+    set_map_geometry(fig, geojson_world)
+
+    steps = [
+        dict(
+            label=str(y),
+            method='animate',
+            args=[[str(y)], dict(mode='immediate', frame=dict(duration=0, redraw=True), transition=dict(duration=0))]
+        )
+        for y in years
+    ]
+
+    map_geos(fig)
+    fig.update_layout(
+        title_text='emisiones de co₂ por país',
+        title_x=0.5,
+        height=650,
+        uirevision='co2-map',
+        updatemenus=[dict(
+            type='buttons',
+            direction='left',
+            x=0.0,
+            y=0.0,
+            xanchor='right',
+            yanchor='top',
+            pad=dict(t=45, r=10),
+            showactive=False,
+            buttons=[
+                dict(
+                    label='▶',
+                    method='animate',
+                    args=[None, dict(
+                        frame=dict(duration=MAP_PLAY_FRAME_MS, redraw=True),
+                        transition=dict(duration=0),
+                        fromcurrent=True
+                    )]
+                ),
+                # pausa: [None] corta la animación sin pasar a otro frame,
+                # no hay nada que redibujar (redraw solo importa al reproducir)
+                dict(
+                    label='❚❚',
+                    method='animate',
+                    args=[[None], dict(mode='immediate', frame=dict(duration=0, redraw=False), transition=dict(duration=0))]
+                )
+            ]
+        )],
+        sliders=[dict(
+            active=active,
+            steps=steps,
+            # etiquetas de cada paso ocultas: con ~275 años se superponen
+            font=dict(color='rgba(0,0,0,0)'),
+            currentvalue=dict(prefix='año: ', font=dict(size=14, color='#333')),
+            pad=dict(t=10)
+        )]
+    )
+
+    return fig
+
+
+@st.cache_resource(max_entries=len(MAP_RESOLUTIONS))
+def load_co2_map_frames(csv_path: str, shp_path: str, resolution: str = MAP_RESOLUTION_DEFAULT, version: int = 0):
+    """
+    json de la figura con todos los años del mapa, una vez por proceso
+    para cada nivel de resolución. se guarda en data/processed (con la
+    huella del csv y del shapefile en el nombre) para que sobreviva a
+    reinicios, y se envía tal cual (ver send_figure_json)
+    (version: ver load_emissions)
+    """
+    key = sources_key([csv_path, shp_path], resolution, transport_key(), FIGURE_FORMAT_VERSION)
+    json_path = os.path.join(CACHE_DIR, f'map_frames_{resolution}_{key}.json')
+
+    if os.path.exists(json_path):
+        with open(json_path, encoding='utf-8') as f:
+            return f.read()
+
+    geojson_map = load_world_geojson(shp_path, resolution)
+    fig = make_co2_map_frames(load_map_assets(csv_path, shp_path, version), geojson_map)
+
+    # reemplazar las versiones anteriores de este nivel
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for old_path in glob.glob(os.path.join(CACHE_DIR, f'map_frames_{resolution}_*.json')):
+        os.remove(old_path)
+    fig_json = pio.to_json(fig, validate=False)
+    tmp_path = f'{json_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(fig_json)
+    os.replace(tmp_path, json_path)
+
+    return fig_json
+
+
+# ============================
+# consultas y tablas por pestaña
+# ============================
+# funciones puras que main() usa para preparar los datos de cada pestaña;
+# también se pueden llamar sin streamlit (ver benchmark.py). con `engine`
+# (ver load_query_engine) la consulta corre en duckdb sobre las tablas en
+# disco; sin él, en pandas sobre los datos en memoria. ambos caminos
+# devuelven las mismas columnas, tipos y orden
+def query_map_year(cube: dict, year: int, engine: DuckDBEngine = None) -> pd.DataFrame:
+    """
+    emisiones de cada país con dato en el año (columnas country, code, co2),
+    ordenadas por iso3
+    """
+    if engine is not None:
+        return engine.year_slice(year)
+
+    co2_row = cube_year(cube, year)
+    has_data = ~np.isnan(co2_row)
+
+    return pd.DataFrame({
+        'country': cube['countries'][has_data],
+        'code': cube['codes'][has_data],
+        'co2': co2_row[has_data]
+    })
+
+
+def cube_columns(cube: dict, countries: list) -> np.ndarray:
+    """
+    country_id (columnas del cubo) de los países dados por nombre, en el
+    mismo orden; los que no están en el cubo se ignoran
+    """
+    return np.array(
+        [cube['country_index'][c] for c in countries if c in cube['country_index']],
+        dtype='int64'
+    )
+
+
+def query_countries_by_year(cube: dict,
+                            countries: list,
+                            year_range: tuple,
+                            profiler: RerunProfiler = NULL_PROFILER,
+                            engine: DuckDBEngine = None) -> pd.DataFrame:
+    """
+    emisiones por año y país para los países y el rango dados
+    (columnas year, country, co2), ordenadas por año y nombre de país
+    """
+    if engine is not None:
+        # filtro y agregación en una sola consulta
+        with profiler.stage(STAGE_AGGREGATE, engine=ENGINE_DUCKDB):
+            return engine.countries_by_year(countries, year_range)
+
+    # filtro: columnas del cubo (por nombre) y filas del rango de años
+    with profiler.stage(STAGE_FILTER):
+        columns = cube_columns(cube, countries)
+        columns = columns[np.argsort(cube['countries'][columns], kind='stable')]
+        span = cube_year_span(cube, year_range)
+        block = cube['values'][span][:, columns]
+
+    # filas (año, país) con dato, en formato largo
+    with profiler.stage(STAGE_AGGREGATE):
+        year_pos, col_pos = np.nonzero(~np.isnan(block))
+        return pd.DataFrame({
+            'year': cube['years'][span][year_pos],
+            'country': pd.Categorical(cube['countries'][columns][col_pos], dtype=cube['country_dtype']),
+            'co2': block[year_pos, col_pos],
+        })
+
+
+def query_global_by_year(cube: dict,
+                         year_range: tuple,
+                         profiler: RerunProfiler = NULL_PROFILER,
+                         engine: DuckDBEngine = None) -> pd.DataFrame:
+    """
+    emisiones globales (todos los países agregados) por año en el rango
+    (columnas year, co2_total)
+    """
+    if engine is not None:
+        with profiler.stage(STAGE_AGGREGATE, engine=ENGINE_DUCKDB):
+            return engine.global_by_year(year_range)
+
+    with profiler.stage(STAGE_FILTER):
+        span = cube_year_span(cube, year_range)
+
+    # total del año: suma de la fila del cubo (los nan son celdas sin dato)
+    with profiler.stage(STAGE_AGGREGATE):
+        return pd.DataFrame({
+            'year': cube['years'][span],
+            'co2_total': np.nansum(cube['values'][span], axis=1),
+        })
+
+
+def query_type_totals(fossil_index: dict,
+                      year: int,
+                      profiler: RerunProfiler = NULL_PROFILER,
+                      engine: DuckDBEngine = None) -> dict:
+    """
+    emisiones acumuladas por tipo hasta `year`, con las etiquetas del gráfico
+    """
+    with profiler.stage(STAGE_AGGREGATE):
+        if engine is not None:
+            cumulative = engine.type_cumulative(year)
+        else:
+            cumulative = fossil_cumulative(fossil_index, year)
+
+    return {
+        'Total (fossil fuels and land-use change)': cumulative['total'],
+        'Fossil fuels': cumulative['fossil_fuels'],
+        'Land-use change': cumulative['land_use_change']
+    }
+
+
+def regional_pivot(rows: pd.DataFrame, names: list) -> pd.DataFrame:
+    """
+    pivot del gráfico de área a partir de las filas en formato largo:
+    índice year, una columna por país (orden alfabético), 0 donde no hay dato
+    """
+    pivot = (
+        rows.pivot(index='year', columns='country', values='percentage')
+        .reindex(columns=pd.Index(names, name='country'))
+        .fillna(0.0)
+    )
+
+    return pivot.sort_index(axis=1)
+
+
+def query_regional(cube: dict,
+                   year_range: tuple,
+                   countries: list = None,
+                   profiler: RerunProfiler = NULL_PROFILER,
+                   engine: DuckDBEngine = None):
+    """
+    participación por país para el gráfico de área: los países dados o,
+    sin países, los REGIONS_TOP_N con más emisiones en el rango.
+    devuelve (pivot, filas en formato largo, sufijo del título)
+    """
+    if engine is not None:
+        with profiler.stage(STAGE_FILTER, engine=ENGINE_DUCKDB):
+            if countries:
+                names = [c for c in countries if c in cube['country_index']]
+                title_suffix = f'(países seleccionados: {len(countries)})'
+            else:
+                names = engine.top_countries(year_range, REGIONS_TOP_N)
+                title_suffix = f'(top {REGIONS_TOP_N} países)'
+
+        with profiler.stage(STAGE_AGGREGATE, engine=ENGINE_DUCKDB):
+            df_top = engine.regional_rows(year_range, names)
+            df_pivot = regional_pivot(df_top, names)
+
+        return df_pivot, df_top, title_suffix
+
+    with profiler.stage(STAGE_FILTER):
+        if countries:
+            # usar países seleccionados (posiciones en el cubo año × país)
+            columns = cube_columns(cube, countries)
+            title_suffix = f'(países seleccionados: {len(countries)})'
+        else:
+            # usar top n: suma del rango leída de las sumas acumuladas
+            columns = cube_top_countries(cube, year_range, REGIONS_TOP_N)
+            title_suffix = f'(top {REGIONS_TOP_N} países)'
+
+    # participación por país: cortes del cubo precalculado
+    with profiler.stage(STAGE_AGGREGATE):
+        df_pivot, df_top = cube_regional_shares(cube, year_range, columns)
+
+    return df_pivot, df_top, title_suffix
+
+
+def make_map_table(df_year: pd.DataFrame) -> pd.DataFrame:
+    """
+    ranking de países por emisiones en el año (ver query_map_year)
+    """
+    df_year = df_year.sort_values('co2', ascending=False, kind='stable')
+
+    # agregar ranking
+    df_year.insert(0, 'Ranking', range(1, len(df_year) + 1))
+    df_year.columns = ['Ranking', 'País', 'Código ISO3', 'Emisiones de CO₂ (toneladas)']
+
+    return df_year
+
+
+def make_countries_table(df_by_country: pd.DataFrame) -> pd.DataFrame:
+    """
+    tabla de emisiones por país y año, del año más reciente al más antiguo
+    """
+    df_display = df_by_country.sort_values(['year', 'co2'], ascending=[False, False])
+    df_display.columns = ['Año', 'País', 'Emisiones de CO₂ (toneladas)']
+
+    return df_display
+
+
+def make_global_table(df_total_year: pd.DataFrame) -> pd.DataFrame:
+    """
+    tabla de emisiones globales por año
+    """
+    df_total_year_display = df_total_year.sort_values('year', ascending=False)
+    df_total_year_display.columns = ['Año', 'Emisiones totales de CO₂ (toneladas)']
+
+    return df_total_year_display
+
+
+def make_type_table(df_emissions: pd.DataFrame) -> pd.DataFrame:
+    """
+    tabla de emisiones por tipo y año
+    """
+    df_emissions_display = df_emissions.sort_values('year', ascending=False)
+    df_emissions_display.columns = ['Año', 'Total (toneladas)', 'Cambio uso suelo (toneladas)', 'Combustibles fósiles (toneladas)']
+
+    return df_emissions_display
+
+
+def make_regions_table(df_top: pd.DataFrame) -> pd.DataFrame:
+    """
+    tabla de emisiones y participación por país y año
+    """
+    # ordenar por año y emisiones
+    df_regions_table = df_top.sort_values(['year', 'co2'], ascending=[False, False])
+
+    df_regions_table = df_regions_table[['year', 'country', 'co2', 'percentage']].copy()
+    df_regions_table.columns = ['Año', 'País', 'Emisiones de CO₂ (toneladas)', 'Porcentaje del total (%)']
+
+    return df_regions_table
+
+
+# ============================
+# constructores de figuras
+# ============================
+# funciones puras: reciben los datos ya filtrados y devuelven una go.Figure.
+# main() las llama a través de show_figure, que cachea el json por parámetros
+def make_countries_line(df_by_country: pd.DataFrame, year_range: tuple):
+    """
+    gráfico de líneas de emisiones por país (columnas year, country, co2)
+    """
+    import plotly.express as px
+
+    fig_line = px.line(
+        df_by_country,
+        x='year',
+        y='co2',
+        color='country',
+        title=f'Evolución de emisiones de CO₂ por país ({year_range[0]}-{year_range[1]})'
+    )
+
+    fig_line.update_traces(
+        mode='lines+markers',
+        line_width=2,
+        marker=dict(size=4)
+    )
+
+    fig_line.update_layout(
+        title_x=0.5,
+        xaxis_title='Año',
+        yaxis_title='Emisiones de CO₂ (toneladas)',
+        hovermode='x unified',
+        font=dict(
+            family='"Lato", "Arial", sans-serif',
+            size=12,
+            color='#333'
+        ),
+        title_font=dict(
+            size=16,
+            family='"Lato", "Arial", sans-serif'
+        ),
+        plot_bgcolor='#f8f9fa',
+        legend=dict(
+            title='País',
+            orientation='v',
+            yanchor='top',
+            y=1,
+            xanchor='left',
+            x=1.02
+        )
+    )
+
+    fig_line.update_xaxes(showgrid=False)
+    fig_line.update_yaxes(
+        showgrid=True,
+        gridcolor='lightgray',
+        griddash='dash',
+        gridwidth=1
+    )
+
+    # el hover muestra toneladas sin decimales
+    return compact_figure(fig_line, decimals=0)
+
+
+def make_global_line(df_total_year: pd.DataFrame, year_range: tuple):
+    """
+    gráfico de línea de emisiones globales (columnas year, co2_total)
+    """
+    import plotly.express as px
+
+    fig_line = px.line(
+        df_total_year,
+        x='year',
+        y='co2_total',
+        title=f'Evolución de emisiones de CO₂: Global ({year_range[0]}-{year_range[1]})'
+    )
+
+    fig_line.update_traces(
+        mode='lines+markers',
+        line_color='#3498DB',
+        line_width=2,
+        marker=dict(
+            size=4,
+            color='#3498DB',
+            symbol='circle'
+        ),
+        hovertemplate='<b>Año:</b> %{x}<br><b>CO₂:</b> %{y:,.0f} toneladas<extra></extra>'
+    )
+
+    fig_line.update_layout(
+        title_x=0.5,
+        xaxis_title='Año',
+        yaxis_title='Emisiones totales de CO₂ (toneladas)',
+        hovermode='x unified',
+        font=dict(
+            family='"Lato", "Arial", sans-serif',
+            size=12,
+            color='#333'
+        ),
+        title_font=dict(
+            size=16,
+            family='"Lato", "Arial", sans-serif'
+        ),
+        plot_bgcolor='#f8f9fa'
+    )
+
+    fig_line.update_xaxes(
+        showgrid=False,
+        range=[df_total_year['year'].min(), df_total_year['year'].max()]
+    )
+
+    fig_line.update_yaxes(
+        showgrid=True,
+        gridcolor='lightgray',
+        griddash='dash',
+        gridwidth=1,
+        range=[0, df_total_year['co2_total'].max() * 1.05]
+    )
+
+    return compact_figure(fig_line, decimals=0)
+
+
+def make_type_bar(totals: dict, year_selected: int):
+    """
+    barras horizontales de emisiones acumuladas por tipo ({tipo: toneladas})
+    """
+    import plotly.graph_objects as go
+
+    df_plot_filtered = pd.DataFrame(list(totals.items()), columns=['tipo', 'emisiones'])
+    df_plot_filtered = df_plot_filtered.sort_values('emisiones', ascending=True)
+
+    # asignar colores según el tipo
+    colors = []
+    for tipo in df_plot_filtered['tipo']:
+        if 'Total' in tipo:
+            colors.append('#E74C3C')
+        elif 'Fossil' in tipo:
+            colors.append('#3498DB')
+        else:
+            colors.append('#2ECC71')
+
+    # crear gráfico sin animación
+    fig_bar = go.Figure(
+        data=[go.Bar(
+            y=df_plot_filtered['tipo'],
+            x=df_plot_filtered['emisiones'],
+            orientation='h',
+            marker=dict(color=colors)
+        )]
+    )
+
+    fig_bar.update_layout(
+        title=f'Emisiones acumuladas de CO₂ por tipo (hasta {year_selected})',
+        title_x=0.5,
+        showlegend=False,
+        xaxis_title='Emisiones totales (toneladas)',
+        yaxis_title='Tipo de emisión',
+        height=600,
+        font=dict(
+            family='"Lato", "Arial", sans-serif',
+            size=12,
+            color='#333'
+        ),
+        title_font=dict(
+            size=16,
+            family='"Lato", "Arial", sans-serif'
+        ),
+        plot_bgcolor='#f8f9fa'
+    )
+
+    fig_bar.update_xaxes(
+        showgrid=True,
+        gridcolor='lightgray',
+        griddash='dash',
+        gridwidth=1,
+        showline=False,
+        zeroline=False
+    )
+    fig_bar.update_yaxes(
+        showgrid=False,
+        showline=False
+    )
+
+    return compact_figure(fig_bar, decimals=0)
+
+
+def make_regions_area(df_pivot: pd.DataFrame, title_suffix: str):
+    """
+    área apilada normalizada al 100% (índice year, una columna por país)
+    """
+    import plotly.graph_objects as go
+
+    fig_area = go.Figure()
+
+    for country in df_pivot.columns:
+        fig_area.add_trace(go.Scatter(
+            x=df_pivot.index,
+            y=df_pivot[country],
+            name=country,
+            mode='lines',
+            stackgroup='one',
+            groupnorm='percent',
+            hovertemplate='<b>%{fullData.name}</b><br>' +
+                          'Año: %{x}<br>' +
+                          'Porcentaje: %{y:.1f}%<extra></extra>'
+        ))
+
+    fig_area.update_layout(
+        title=f'Evolución de emisiones de CO₂ por región {title_suffix}',
+        title_x=0.5,
+        xaxis_title='Año',
+        yaxis_title='Porcentaje de emisiones globales',
+        hovermode='x unified',
+        yaxis=dict(
+            ticksuffix='%',
+            range=[0, 100]
+        ),
+        legend=dict(
+            orientation='v',
+            yanchor='middle',
+            y=0.5,
+            xanchor='left',
+            x=1.02
+        ),
+        height=600,
+        font=dict(
+            family='"Lato", "Arial", sans-serif',
+            size=12,
+            color='#333'
+        ),
+        title_font=dict(
+            size=16,
+            family='"Lato", "Arial", sans-serif'
+        ),
+        plot_bgcolor='#f8f9fa'
+    )
+
+    fig_area.update_xaxes(
+        showgrid=False,
+        range=[df_pivot.index.min(), df_pivot.index.max()]
+    )
+
+    fig_area.update_yaxes(
+        showgrid=True,
+        gridcolor='lightgray',
+        griddash='dash',
+        gridwidth=1,
+        range=[0, 100]
+    )
+
+    # porcentajes con dos decimales (el hover muestra uno)
+    return compact_figure(fig_area, decimals=2)
+
+
+def figure_store_dir() -> str:
+    """
+    almacén en disco de la caché de figuras (ver precompute.py), uno por
+    huella de los archivos fuente y del formato de transporte: si cambia
+    un csv o el shapefile, las figuras guardadas dejan de usarse
+    """
+    key = sources_key([CSV_PATH, CSV_FOSSIL_PATH, SHP_PATH], 'figures', transport_key(), FIGURE_FORMAT_VERSION)
+    return os.path.join(CACHE_DIR, 'figures', key)
+
+
+def prune_figure_stores(current_dir: str):
+    """
+    borra los almacenes de figuras de huellas anteriores
+    """
+    for old_dir in glob.glob(os.path.join(os.path.dirname(current_dir), '*')):
+        if old_dir != current_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+
+@st.cache_resource
+def get_figure_cache(store_dir: str) -> FigureCache:
+    """
+    caché de figuras compartida por todas las sesiones del proceso,
+    respaldada por el almacén en disco `store_dir`
+    """
+    return FigureCache(FIGURE_CACHE_BYTES, store_dir)
+
+
+def active_figure_cache() -> FigureCache:
+    """
+    caché de figuras de este proceso: en modo estático solo en memoria
+    (las figuras se leen del paquete), si no, con el almacén en disco
+    """
+    if BUNDLE_DIR:
+        return get_figure_cache(None)
+    return get_figure_cache(figure_store_dir())
+
+
+@st.cache_resource
+def get_stage_metrics() -> StageMetrics:
+    """
+    contadores de etapas compartidos por todas las sesiones del proceso
+    """
+    return StageMetrics()
+
+
+def figure_layout(fig_json: str) -> dict:
+    """
+    layout de una figura serializada, sin parsear sus trazas: las trazas
+    no tienen clave layout, así que la primera es la de la figura
+    """
+    start = fig_json.find('"layout":')
+    if start < 0:
+        return {}
+    layout, _ = json.JSONDecoder().raw_decode(fig_json, start + len('"layout":'))
+    return layout
+
+
+@st.cache_resource
+def chart_internals():
+    """
+    módulos internos de streamlit con los que st.plotly_chart arma su
+    mensaje, o None si esta versión no los tiene (ver send_figure_json)
+    """
+    try:
+        from streamlit.elements.lib.form_utils import current_form_id
+        from streamlit.elements.lib.layout_utils import LayoutConfig
+        from streamlit.elements.lib.utils import compute_and_register_element_id
+        from streamlit.proto.PlotlyChart_pb2 import PlotlyChart
+    except ImportError:
+        return None
+
+    main_dg = getattr(st, '_main', None)
+    if main_dg is None or not hasattr(main_dg, '_enqueue'):
+        return None
+
+    return {
+        'current_form_id': current_form_id,
+        'LayoutConfig': LayoutConfig,
+        'element_id': compute_and_register_element_id,
+        'PlotlyChart': PlotlyChart,
+        'dg': main_dg,
+    }
+
+
+def send_figure_json(fig_json: str):
+    """
+    envía al navegador el json de una figura tal cual. st.plotly_chart
+    solo acepta figuras o dicts: reconstruye la go.Figure, la valida y la
+    vuelve a serializar (~0.5 s con el mapa, y deshace el geojson ya
+    insertado por make_co2_map_json). acá se arma el mismo mensaje con
+    el json ya hecho (ver enqueue_figure_json); si la versión de
+    streamlit no tiene esos módulos internos o cambiaron, se usa
+    st.plotly_chart con el dict de la figura
+    """
+    internals = chart_internals()
+    if internals is not None and not internals.get('failed'):
+        try:
+            enqueue_figure_json(internals, fig_json)
+            return
+        except Exception:
+            # no se vuelve a intentar en este proceso
+            internals['failed'] = True
+            logging.getLogger(__name__).warning(
+                'no se pudo enviar la figura ya serializada; se usa st.plotly_chart', exc_info=True
+            )
+
+    st.plotly_chart(json.loads(fig_json), width='stretch')
+
+
+def enqueue_figure_json(internals: dict, fig_json: str):
+    """
+    arma el mensaje de st.plotly_chart con el json ya hecho y lo envía
+    (módulos internos de streamlit: ver chart_internals)
+    """
+    # alto del elemento: el del layout de la figura (todas lo fijan), como
+    # hace st.plotly_chart con height='content'; 450 es el de plotly.js
+    height = figure_layout(fig_json).get('height') or 450
+    dg = internals['dg']
+
+    proto = internals['PlotlyChart']()
+    proto.theme = 'streamlit'
+    proto.form_id = internals['current_form_id'](dg)
+    proto.spec = fig_json
+    proto.config = json.dumps({})
+    proto.id = internals['element_id'](
+        'plotly_chart',
+        user_key=None,
+        key_as_main_identity=False,
+        dg=dg,
+        plotly_spec=proto.spec,
+        plotly_config=proto.config,
+        selection_mode=('points', 'box', 'lasso'),
+        is_selection_activated=False,
+        theme='streamlit',
+        width='stretch',
+        height=int(height),
+        alt=None,
+    )
+    dg._enqueue('plotly_chart', proto, layout_config=internals['LayoutConfig'](width='stretch', height=int(height)))
+
+
+def show_figure(key: tuple, build, profiler: RerunProfiler = NULL_PROFILER):
+    """
+    muestra la figura identificada por `key` (pestaña + parámetros),
+    construyéndola con build() solo si no está en la caché de figuras
+    """
+    build_seconds = []
+
+    def timed_build():
+        start = time.perf_counter()
+        fig = build()
+        build_seconds.append(time.perf_counter() - start)
+        return fig
+
+    start = time.perf_counter()
+    fig_json = active_figure_cache().get_or_build(key, timed_build)
+    lookup_seconds = time.perf_counter() - start
+
+    # la serialización ocurre dentro de la caché: es el resto del tiempo de consulta
+    if build_seconds:
+        profiler.record(STAGE_FIGURE_BUILD, build_seconds[0], cache='miss')
+        profiler.record(STAGE_FIGURE_SERIALIZE, lookup_seconds - build_seconds[0], cache='miss')
+    else:
+        profiler.record(STAGE_FIGURE_BUILD, lookup_seconds, cache='hit')
+
+    with profiler.stage(STAGE_FIGURE_SEND, bytes=len(fig_json)):
+        send_figure_json(fig_json)
+
+
+def table_page(df: pd.DataFrame, formats: dict, page: int = 1, page_size: int = TABLE_PAGE_SIZE) -> pd.DataFrame:
+    """
+    filas de una página de la tabla, con las columnas de formato entero
+    redondeadas de forma vectorizada
+    """
+    start = (page - 1) * page_size
+    window = df.iloc[start:start + page_size].copy()
+
+    for col, fmt in formats.items():
+        if fmt.endswith('d'):
+            window[col] = window[col].round(0)
+
+    return window
+
+
+def show_table(df: pd.DataFrame,
+               formats: dict,
+               key: str,
+               page_size: int = TABLE_PAGE_SIZE,
+               profiler: RerunProfiler = NULL_PROFILER):
+    """
+    tabla paginada en el servidor: solo se envía al navegador la página
+    visible. los números se formatean con column_config (en el navegador)
+    en lugar de un Styler; las columnas con formato entero se redondean
+    de forma vectorizada y la página se compacta (ver transport.compact_table)
+    antes de enviarla. con el perfil activo se anotan los bytes en arrow
+    y los que ahorra la compactación
+    """
+    n_rows = len(df)
+    n_pages = max(1, -(-n_rows // page_size))
+
+    page = 1
+    if n_pages > 1:
+        # la clave incluye el número de páginas: si cambia el filtro, se vuelve a la página 1
+        page = st.number_input(
+            'página',
+            min_value=1,
+            max_value=n_pages,
+            value=1,
+            step=1,
+            key=f'{key}_page_{n_pages}'
+        )
+
+    start = (page - 1) * page_size
+    window = table_page(df, formats, page, page_size)
+    payload = compact_table(window, formats)
+    labels = {'rows': len(window)}
+    if profiler.enabled:
+        labels['bytes'] = arrow_bytes(payload)
+        labels['bytes_saved'] = arrow_bytes(window) - labels['bytes']
+
+    with profiler.stage(STAGE_TABLE_SEND, **labels):
+        st.dataframe(
+            payload,
+            column_config={col: st.column_config.NumberColumn(format=fmt) for col, fmt in formats.items()},
+            width='stretch',
+            hide_index=True,
+            height=400
+        )
+
+    if n_pages > 1:
+        st.caption(f'filas {start + 1}–{min(start + page_size, n_rows)} de {n_rows:,} (página {page} de {n_pages})')
+
+
+def show_profile_panel(profiler: RerunProfiler):
+    """
+    panel plegable en el sidebar con las etapas del rerun actual y los
+    contadores acumulados del proceso en formato openmetrics
+    """
+    with st.sidebar.expander('perfil del rerun', expanded=False):
+        st.caption(f'total: {profiler.total_ms():,.1f} ms (sin contar este panel)')
         st.dataframe(
-            df_year.style.format({
-                'Emisiones de CO₂ (toneladas)': '{:,.0f}'
-            }),
-            use_container_width=True,
-            height=400
-        )
-    
-    elif selected_tab == 'Evolución temporal':
-        st.header("Evolución temporal de emisiones globales")
-        
-        if selected_countries and len(selected_countries) > 0:
-            with st.spinner('Procesando datos de países seleccionados...'):
-                # modo: países seleccionados
-                df_filtered = df_co2[df_co2['country'].isin(selected_countries)]
-                df_filtered = df_filtered[
-                    (df_filtered['year'] >= year_range[0]) & 
-                    (df_filtered['year'] <= year_range[1])
-                ]
-                
-                # agrupar por año y país
-                df_by_country = df_filtered.groupby(['year', 'country'], as_index=False).agg({'co2': 'sum'})
-                
-                # crear gráfico de líneas múltiples
-                fig_line = px.line(
-                    df_by_country,
-                    x='year',
-                    y='co2',
-                    color='country',
-                    title=f'Evolución de emisiones de CO₂ por país ({year_range[0]}-{year_range[1]})'
-                )
-            
-            fig_line.update_traces(
-                mode='lines+markers',
-                line_width=2,
-                marker=dict(size=4)
-            )
-            
-            fig_line.update_layout(
-                title_x=0.5,
-                xaxis_title='Año',
-                yaxis_title='Emisiones de CO₂ (toneladas)',
-                hovermode='x unified',
-                font=dict(
-                    family='"Lato", "Arial", sans-serif',
-                    size=12,
-                    color='#333'
-                ),
-                title_font=dict(
-                    size=16,
-                    family='"Lato", "Arial", sans-serif'
-                ),
-                plot_bgcolor='#f8f9fa',
-                legend=dict(
-                    title='País',
-                    orientation='v',
-                    yanchor='top',
-                    y=1,
-                    xanchor='left',
-                    x=1.02
-                )
-            )
-            
-            fig_line.update_xaxes(showgrid=False)
-            fig_line.update_yaxes(
-                showgrid=True,
-                gridcolor='lightgray',
-                griddash='dash',
-                gridwidth=1
-            )
-            
-            st.plotly_chart(fig_line, use_container_width=True)
-            
-            # tabla con datos por país
-            st.markdown('---')
-            st.subheader(f'Tabla de emisiones por país y año ({year_range[0]}-{year_range[1]})')
-            
-            df_display = df_by_country.copy()
-            df_display = df_display.sort_values(['year', 'co2'], ascending=[False, False])
-            df_display.columns = ['Año', 'País', 'Emisiones de CO₂ (toneladas)']
-            
-            st.dataframe(
-                df_display.style.format({
-                    'Emisiones de CO₂ (toneladas)': '{:,.0f}'
-                }),
-                use_container_width=True,
-                height=400
-            )
-            
-        else:
-            with st.spinner('Calculando emisiones globales...'):
-                # modo: global (todos los países agregados)
-                df_total_year = (
-                    df_co2.groupby('year', as_index=False)
-                    .agg({'co2': 'sum'})
-                    .rename(columns={'co2': 'co2_total'})
-                )
-                
-                # filtrar datos según el rango seleccionado
-                df_total_year_filtered = df_total_year[
-                    (df_total_year['year'] >= year_range[0]) & 
-                    (df_total_year['year'] <= year_range[1])
-                ]
-                
-                # crear gráfico de línea
-                fig_line = px.line(
-                    df_total_year_filtered,
-                x='year',
-                y='co2_total',
-                title=f'Evolución de emisiones de CO₂: Global ({year_range[0]}-{year_range[1]})'
-            )
-            
-            fig_line.update_traces(
-                mode='lines+markers',
-                line_color='#3498DB',
-                line_width=2,
-                marker=dict(
-                    size=4,
-                    color='#3498DB',
-                    symbol='circle'
-                ),
-                hovertemplate='<b>Año:</b> %{x}<br><b>CO₂:</b> %{y:,.0f} toneladas<extra></extra>'
-            )
-            
-            fig_line.update_layout(
-                title_x=0.5,
-                xaxis_title='Año',
-                yaxis_title='Emisiones totales de CO₂ (toneladas)',
-                hovermode='x unified',
-                font=dict(
-                    family='"Lato", "Arial", sans-serif',
-                    size=12,
-                    color='#333'
-                ),
-                title_font=dict(
-                    size=16,
-                    family='"Lato", "Arial", sans-serif'
-                ),
-                plot_bgcolor='#f8f9fa'
-            )
-            
-            fig_line.update_xaxes(
-                showgrid=False,
-                range=[df_total_year_filtered['year'].min(), df_total_year_filtered['year'].max()]
-            )
-            
-            fig_line.update_yaxes(
-                showgrid=True,
-                gridcolor='lightgray',
-                griddash='dash',
-                gridwidth=1,
-                range=[0, df_total_year_filtered['co2_total'].max() * 1.05]
-            )
-            
-            st.plotly_chart(fig_line, use_container_width=True)
-            
-            # tabla resumen
-            st.markdown('---')
-            st.subheader(f'tabla de emisiones totales por año ({year_range[0]}-{year_range[1]})')
-            
-            df_total_year_display = df_total_year_filtered.copy()
-            df_total_year_display = df_total_year_display.sort_values('year', ascending=False)
-            df_total_year_display.columns = ['Año', 'Emisiones totales de CO₂ (toneladas)']
-            
-            st.dataframe(
-                df_total_year_display.style.format({
-                    'Emisiones totales de CO₂ (toneladas)': '{:,.0f}'
-                }),
-                use_container_width=True,
-                height=400
-            )
-    
-    elif selected_tab == 'Emisiones por tipo':
-        st.header("Emisiones acumuladas por tipo")
-        
-        with st.spinner('Calculando emisiones por tipo...'):
-            # calcular emisiones por tipo
-            df_emissions = (
-                df_fossil.groupby('year', as_index=False)
-                .agg({
-                    'total': 'sum',
-                    'land_use_change': 'sum',
-                    'fossil_fuels': 'sum'
-                })
-            )
-        
-        # usar el año seleccionado del sidebar
-        df_filtered = df_emissions[df_emissions['year'] <= year_selected]
-        
-        totals_filtered = {
-            'Total (fossil fuels and land-use change)': df_filtered['total'].sum(),
-            'Fossil fuels': df_filtered['fossil_fuels'].sum(),
-            'Land-use change': df_filtered['land_use_change'].sum()
-        }
-        df_plot_filtered = pd.DataFrame(list(totals_filtered.items()), columns=['tipo', 'emisiones'])
-        df_plot_filtered = df_plot_filtered.sort_values('emisiones', ascending=True)
-        
-        # asignar colores según el tipo
-        colors = []
-        for tipo in df_plot_filtered['tipo']:
-            if 'Total' in tipo:
-                colors.append('#E74C3C')
-            elif 'Fossil' in tipo:
-                colors.append('#3498DB')
-            else:
-                colors.append('#2ECC71')
-        
-        # crear gráfico sin animación
-        fig_bar = go.Figure(
-            data=[go.Bar(
-                y=df_plot_filtered['tipo'],
-                x=df_plot_filtered['emisiones'],
-                orientation='h',
-                marker=dict(color=colors)
-            )]
-        )
-        
-        fig_bar.update_layout(
-            title=f'Emisiones acumuladas de CO₂ por tipo (hasta {year_selected})',
-            title_x=0.5,
-            showlegend=False,
-            xaxis_title='Emisiones totales (toneladas)',
-            yaxis_title='Tipo de emisión',
-            height=600,
-            font=dict(
-                family='"Lato", "Arial", sans-serif',
-                size=12,
-                color='#333'
-            ),
-            title_font=dict(
-                size=16,
-                family='"Lato", "Arial", sans-serif'
-            ),
-            plot_bgcolor='#f8f9fa'
-        )
-        
-        fig_bar.update_xaxes(
-            showgrid=True,
-            gridcolor='lightgray',
-            griddash='dash',
-            gridwidth=1,
-            showline=False,
-            zeroline=False
-        )
-        fig_bar.update_yaxes(
-            showgrid=False,
-            showline=False
-        )
-        
-        st.plotly_chart(fig_bar, use_container_width=True)
-        
-        # tabla resumen
-        st.markdown('---')
-        st.subheader('tabla de emisiones por tipo y año')
-        
-        df_emissions_display = df_emissions.copy()
-        df_emissions_display = df_emissions_display.sort_values('year', ascending=False)
-        df_emissions_display.columns = ['Año', 'Total (toneladas)', 'Cambio uso suelo (toneladas)', 'Combustibles fósiles (toneladas)']
-        
-        st.dataframe(
-            df_emissions_display.style.format({
-                'Total (toneladas)': '{:,.0f}',
-                'Cambio uso suelo (toneladas)': '{:,.0f}',
-                'Combustibles fósiles (toneladas)': '{:,.0f}'
-            }),
-            use_container_width=True,
-            height=400
+            pd.DataFrame(profiler.stages),
+            column_config={'ms': st.column_config.NumberColumn(format='%.2f')},
+            width='stretch',
+            hide_index=True
         )
-    
-    elif selected_tab == 'Evolución por región':
-        st.header("Evolución de emisiones por región")
-        
-        with st.spinner('Procesando datos regionales...'):
-            # filtrar por rango de años del sidebar
-            df_co2_filtered = df_co2[(df_co2['year'] >= year_range[0]) & (df_co2['year'] <= year_range[1])]
-            
-            # calcular porcentajes por país
-            df_regions = df_co2_filtered.groupby(['year', 'country'], as_index=False).agg({'co2': 'sum'})
-            df_regions['total_year'] = df_regions.groupby('year')['co2'].transform('sum')
-            df_regions['percentage'] = (df_regions['co2'] / df_regions['total_year']) * 100
-            
-            # determinar qué países usar
-            if selected_countries_regions and len(selected_countries_regions) > 0:
-                # usar países seleccionados
-                countries_to_plot = selected_countries_regions
-                df_top = df_regions[df_regions['country'].isin(countries_to_plot)]
-                title_suffix = f'(países seleccionados: {len(countries_to_plot)})'
-            else:
-                # usar top 10
-                top_countries = df_regions.groupby('country')['co2'].sum().nlargest(10).index
-                df_top = df_regions[df_regions['country'].isin(top_countries)]
-                title_suffix = '(top 10 países)'
-        
-        df_pivot = df_top.pivot_table(
-            index='year',
-            columns='country',
-            values='percentage',
-            fill_value=0
+        st.code(get_stage_metrics().to_openmetrics(), language='text')
+
+
+# ============================
+# pestañas
+# ============================
+# cada pestaña dibuja sus controles en el sidebar y su contenido. main()
+# la ejecuta dentro de un fragmento (show_tab): al mover un control solo
+# se vuelve a ejecutar la pestaña, sin recorrer main() ni recargar datos.
+# los sliders envían su valor al soltarlos, no durante el arrastre, y un
+# valor nuevo corta la ejecución en curso del fragmento (streamlit no
+# encola las posiciones intermedias)
+def show_precompute_status(store_dir: str):
+    """
+    indicador de avance del precálculo de figuras (ver precompute.py):
+    barra mientras corre, una línea cuando terminó
+    """
+    from precompute import read_status
+
+    status = read_status(store_dir)
+    if not status.get('total'):
+        return
+
+    done, total = status['done'], status['total']
+    if status.get('finished_at'):
+        st.sidebar.caption(f'figuras precalculadas: {done:,} ({status["errors"]} errores)')
+    else:
+        st.sidebar.progress(done / total, text=f'precalculando figuras: {done:,} de {total:,}')
+
+
+def show_rerun_footer(profiler: RerunProfiler):
+    """
+    cierre de cada ejecución de la pestaña: contadores de la caché de
+    figuras en el sidebar y, con el perfil activo, log y panel
+    """
+    cache_stats = active_figure_cache().stats()
+    source = f'paquete estático: {BUNDLE_DIR}' if BUNDLE_DIR else f'motor de consultas: {QUERY_ENGINE}'
+    st.sidebar.caption(
+        f"caché de figuras: {cache_stats['hits']} aciertos, {cache_stats['disk_hits']} de disco, "
+        f"{cache_stats['misses']} fallos ({cache_stats['size']} figuras, "
+        f"{cache_stats['bytes'] / 1e6:,.1f} de {cache_stats['max_bytes'] / 1e6:,.0f} MB) "
+        f"· {source}"
+    )
+    if not BUNDLE_DIR:
+        show_precompute_status(figure_store_dir())
+
+    if profiler.enabled:
+        profiler.emit(get_stage_metrics())
+        show_profile_panel(profiler)
+
+
+def show_map_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña del mapa: año, modo y resolución en el sidebar, mapa y
+    tabla del año
+    """
+    co2_cube = data['cube']
+    map_data = data['map_assets']
+    engine = data['engine']
+    data_version = versions[CSV_PATH]
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('controles')
+
+    min_year = int(co2_cube['years'][0])
+    max_year = int(co2_cube['years'][-1])
+
+    años_destacados = [a for a in MAP_HIGHLIGHT_YEARS if min_year <= a <= max_year]
+
+    preset = st.sidebar.selectbox(
+        'años destacados',
+        options=['ninguno'] + [str(a) for a in años_destacados],
+        index=0
+    )
+
+    if preset != 'ninguno':
+        year_default = int(preset)
+    else:
+        year_default = max_year
+
+    year = st.sidebar.slider(
+        'año',
+        min_value=min_year,
+        max_value=max_year,
+        value=year_default,
+        step=1
+    )
+
+    map_mode = st.sidebar.radio(
+        'modo del mapa',
+        options=[MAP_MODE_SERVER, MAP_MODE_BROWSER],
+        help='Con todos los años en el navegador la geometría se envía una sola vez '
+             'y el año se cambia con el slider bajo el mapa, sin recargar la página'
+    )
+
+    map_resolution = st.sidebar.selectbox(
+        'resolución del mapa',
+        options=list(MAP_RESOLUTIONS),
+        index=list(MAP_RESOLUTIONS).index(MAP_RESOLUTION_DEFAULT),
+        help='Una resolución menor carga el mapa más rápido en conexiones lentas'
+    )
+
+    st.sidebar.markdown(
+        """
+        usa el slider para moverte año a año y el selector de
+        años destacados para saltar rápidamente a hitos históricos.
+        """
+    )
+
+    st.header("Emisiones de CO₂ por país")
+
+    # generar mapa
+    if year < min_year or year > max_year:
+        st.warning(f'no hay datos para el año {year}. el rango válido es {min_year}–{max_year}.')
+        return
+
+    if map_mode == MAP_MODE_BROWSER:
+        with st.spinner('Generando mapa para todos los años...'):
+            with profiler.stage(STAGE_FIGURE_BUILD, step='mapa animado'):
+                fig_json = load_co2_map_frames(CSV_PATH, SHP_PATH, map_resolution, data_version)
+            with profiler.stage(STAGE_FIGURE_SEND, bytes=len(fig_json)):
+                send_figure_json(fig_json)
+        st.caption('usa ▶ o el slider bajo el mapa para recorrer los años; la tabla sigue el año del sidebar.')
+    else:
+        with st.spinner(f'Generando mapa para el año {year}...'):
+            show_figure(
+                ('map', data_version, year, map_resolution),
+                lambda: make_co2_map_json(map_data, load_world_geojson_text(SHP_PATH, map_resolution), year),
+                profiler
+            )
+
+    # tabla resumen opcional
+    st.markdown('---')
+    st.subheader('tabla de emisiones por país en el año seleccionado')
+
+    with profiler.stage(STAGE_TABLE_BUILD):
+        df_table = make_map_table(query_map_year(co2_cube, year, engine))
+
+    show_table(
+        df_table,
+        TABLE_FORMATS['map'],
+        key='table_map',
+        profiler=profiler
+    )
+
+
+def show_temporal_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña de evolución temporal: rango de años y filtro de países en
+    el sidebar, línea global o por país y su tabla
+    """
+    cube = data['cube']
+    engine = data['engine']
+    data_version = versions[CSV_PATH]
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Controles de rango temporal')
+
+    min_year_global = int(cube['years'][0])
+    max_year_global = int(cube['years'][-1])
+
+    year_range = st.sidebar.slider(
+        'Rango de años',
+        min_value=min_year_global,
+        max_value=max_year_global,
+        value=(min_year_global, max_year_global),
+        step=1,
+        help='Selecciona el rango de años para visualizar en el gráfico'
+    )
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Filtro de países')
+
+    # obtener lista de países disponibles
+    available_countries = sorted(cube['countries'])
+
+    # checkbox para activar/desactivar filtro
+    filter_countries = st.sidebar.checkbox(
+        'Filtrar por países específicos',
+        value=False,
+        help='Activa para seleccionar países individuales'
+    )
+
+    if filter_countries:
+        selected_countries = st.sidebar.multiselect(
+            'Selecciona países',
+            options=available_countries,
+            default=[c for c in DEFAULT_COUNTRIES if c in available_countries] or available_countries[:5],
+            help='Puedes seleccionar múltiples países'
         )
-        
-        fig_area = go.Figure()
-        
-        for country in df_pivot.columns:
-            fig_area.add_trace(go.Scatter(
-                x=df_pivot.index,
-                y=df_pivot[country],
-                name=country,
-                mode='lines',
-                stackgroup='one',
-                groupnorm='percent',
-                hovertemplate='<b>%{fullData.name}</b><br>' +
-                              'Año: %{x}<br>' +
-                              'Porcentaje: %{y:.1f}%<extra></extra>'
-            ))
-        
-        fig_area.update_layout(
-            title=f'Evolución de emisiones de CO₂ por región {title_suffix}',
-            title_x=0.5,
-            xaxis_title='Año',
-            yaxis_title='Porcentaje de emisiones globales',
-            hovermode='x unified',
-            yaxis=dict(
-                ticksuffix='%',
-                range=[0, 100]
-            ),
-            legend=dict(
-                orientation='v',
-                yanchor='middle',
-                y=0.5,
-                xanchor='left',
-                x=1.02
-            ),
-            height=600,
-            font=dict(
-                family='"Lato", "Arial", sans-serif',
-                size=12,
-                color='#333'
-            ),
-            title_font=dict(
-                size=16,
-                family='"Lato", "Arial", sans-serif'
-            ),
-            plot_bgcolor='#f8f9fa'
+    else:
+        selected_countries = None
+
+    st.header("Evolución temporal de emisiones globales")
+
+    if selected_countries and len(selected_countries) > 0:
+        with st.spinner('Procesando datos de países seleccionados...'):
+            # modo: países seleccionados
+            df_by_country = query_countries_by_year(cube, selected_countries, year_range, profiler, engine)
+
+        show_figure(
+            ('line_countries', data_version, tuple(year_range), tuple(sorted(map(str, selected_countries)))),
+            lambda: make_countries_line(df_by_country, year_range),
+            profiler
         )
-        
-        fig_area.update_xaxes(
-            showgrid=False,
-            range=[df_pivot.index.min(), df_pivot.index.max()]
+
+        # tabla con datos por país
+        st.markdown('---')
+        st.subheader(f'Tabla de emisiones por país y año ({year_range[0]}-{year_range[1]})')
+
+        with profiler.stage(STAGE_TABLE_BUILD):
+            df_table = make_countries_table(df_by_country)
+
+        show_table(
+            df_table,
+            TABLE_FORMATS['countries'],
+            key='table_countries',
+            profiler=profiler
         )
-        
-        fig_area.update_yaxes(
-            showgrid=True,
-            gridcolor='lightgray',
-            griddash='dash',
-            gridwidth=1,
-            range=[0, 100]
+
+    else:
+        with st.spinner('Calculando emisiones globales...'):
+            # modo: global (todos los países agregados)
+            df_total_year_filtered = query_global_by_year(cube, year_range, profiler, engine)
+
+        show_figure(
+            ('line_global', data_version, tuple(year_range)),
+            lambda: make_global_line(df_total_year_filtered, year_range),
+            profiler
         )
-        
-        st.plotly_chart(fig_area, use_container_width=True)
-        
+
         # tabla resumen
         st.markdown('---')
-        if selected_countries_regions and len(selected_countries_regions) > 0:
-            st.subheader(f'Tabla de emisiones por país (países seleccionados)')
-        else:
-            st.subheader('Tabla de emisiones por país (top 10)')
-        
-        # filtrar top 10 y ordenar
-        df_regions_table = df_top.copy()
-        df_regions_table = df_regions_table.sort_values(['year', 'co2'], ascending=[False, False])
-        
-        df_regions_table = df_regions_table[['year', 'country', 'co2', 'percentage']].copy()
-        df_regions_table.columns = ['Año', 'País', 'Emisiones de CO₂ (toneladas)', 'Porcentaje del total (%)']
-        
-        st.dataframe(
-            df_regions_table.style.format({
-                'Emisiones de CO₂ (toneladas)': '{:,.0f}',
-                'Porcentaje del total (%)': '{:.2f}%'
-            }),
-            use_container_width=True,
-            height=400
+        st.subheader(f'tabla de emisiones totales por año ({year_range[0]}-{year_range[1]})')
+
+        with profiler.stage(STAGE_TABLE_BUILD):
+            df_table = make_global_table(df_total_year_filtered)
+
+        show_table(
+            df_table,
+            TABLE_FORMATS['global'],
+            key='table_global',
+            profiler=profiler
         )
-    
-    elif selected_tab == 'Documentación':
-        st.header("📚 Documentación")
-        
-        # Introducción
+
+
+def show_type_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña de emisiones por tipo: año de corte en el sidebar, barras
+    acumuladas y tabla por año
+    """
+    fossil_index = data['fossil_index']
+    engine = data['engine']
+    fossil_version = versions[CSV_FOSSIL_PATH]
+
+    # años disponibles para los controles (índice precalculado)
+    years_ctrl = fossil_index['years']
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Controles de año')
+
+    year_selected = st.sidebar.slider(
+        'Acumular hasta año',
+        min_value=int(years_ctrl[0]),
+        max_value=int(years_ctrl[-1]),
+        value=2024 if 2024 in years_ctrl else int(years_ctrl[-1]),
+        step=1,
+        help='Selecciona hasta qué año se acumulan las emisiones'
+    )
+
+    st.header("Emisiones acumuladas por tipo")
+
+    # usar el año seleccionado del sidebar: lectura de la suma acumulada
+    totals_filtered = query_type_totals(fossil_index, year_selected, profiler, engine)
+
+    show_figure(
+        ('type_bar', fossil_version, year_selected),
+        lambda: make_type_bar(totals_filtered, year_selected),
+        profiler
+    )
+
+    # tabla resumen
+    st.markdown('---')
+    st.subheader('tabla de emisiones por tipo y año')
+
+    # totales por año ya calculados en el índice
+    with profiler.stage(STAGE_TABLE_BUILD):
+        df_table = make_type_table(fossil_index['totals'])
+
+    show_table(
+        df_table,
+        TABLE_FORMATS['type'],
+        key='table_type',
+        profiler=profiler
+    )
+
+
+def show_regions_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña de evolución por región: rango de años y filtro de países
+    en el sidebar, área apilada y tabla
+    """
+    co2_cube = data['cube']
+    engine = data['engine']
+    data_version = versions[CSV_PATH]
+
+    # calcular años disponibles para los controles
+    years_regions = co2_cube['years']
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Controles de rango temporal')
+
+    year_range = st.sidebar.slider(
+        'Rango de años',
+        min_value=int(years_regions[0]),
+        max_value=int(years_regions[-1]),
+        value=(int(years_regions[0]), int(years_regions[-1])),
+        step=1,
+        help='Selecciona el rango de años para visualizar en el gráfico'
+    )
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Filtro de países')
+
+    # obtener lista de países disponibles
+    available_countries_regions = sorted(co2_cube['countries'])
+
+    # checkbox para activar/desactivar filtro
+    filter_countries_regions = st.sidebar.checkbox(
+        'Filtrar por países específicos',
+        value=False,
+        help='Activa para seleccionar países individuales en lugar de top 10',
+        key='filter_regions'
+    )
+
+    if filter_countries_regions:
+        selected_countries_regions = st.sidebar.multiselect(
+            'Selecciona países',
+            options=available_countries_regions,
+            default=[c for c in DEFAULT_COUNTRIES if c in available_countries_regions] or available_countries_regions[:5],
+            help='Puedes seleccionar múltiples países',
+            key='multiselect_regions'
+        )
+    else:
+        selected_countries_regions = None
+
+    st.header("Evolución de emisiones por región")
+
+    with st.spinner('Procesando datos regionales...'):
+        df_pivot, df_top, title_suffix = query_regional(co2_cube, year_range, selected_countries_regions, profiler, engine)
+
+    regions_key = tuple(sorted(map(str, selected_countries_regions))) if selected_countries_regions else None
+    show_figure(
+        ('area', data_version, tuple(year_range), regions_key),
+        lambda: make_regions_area(df_pivot, title_suffix),
+        profiler
+    )
+
+    # tabla resumen
+    st.markdown('---')
+    if selected_countries_regions and len(selected_countries_regions) > 0:
+        st.subheader(f'Tabla de emisiones por país (países seleccionados)')
+    else:
+        st.subheader(f'Tabla de emisiones por país (top {REGIONS_TOP_N})')
+
+    with profiler.stage(STAGE_TABLE_BUILD):
+        df_table = make_regions_table(df_top)
+
+    show_table(
+        df_table,
+        TABLE_FORMATS['regions'],
+        key='table_regions',
+        profiler=profiler
+    )
+
+
+def show_docs_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña de documentación (texto fijo)
+    """
+    st.header("📚 Documentación")
+
+    # Introducción
+    st.markdown("""
+    Esta aplicación interactiva permite explorar y analizar las emisiones de CO₂ a nivel global 
+    a través de múltiples visualizaciones y periodos temporales.
+    """)
+
+    # Datasets
+    st.markdown("---")
+    st.subheader("📊 Datasets utilizados")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
         st.markdown("""
-        Esta aplicación interactiva permite explorar y analizar las emisiones de CO₂ a nivel global 
-        a través de múltiples visualizaciones y periodos temporales.
+        **1. Annual CO₂ emissions per country**
+        - **Fuente**: [Our World in Data](https://ourworldindata.org/co2-emissions)
+        - **Periodo**: 1750 - 2024
+        - **Unidad**: Toneladas de CO₂
+        - **Cobertura**: ~200 países y territorios
+        - **Variables**: País, código ISO3, año, emisiones totales
         """)
-        
-        # Datasets
-        st.markdown("---")
-        st.subheader("📊 Datasets utilizados")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("""
-            **1. Annual CO₂ emissions per country**
-            - **Fuente**: [Our World in Data](https://ourworldindata.org/co2-emissions)
-            - **Periodo**: 1750 - 2024
-            - **Unidad**: Toneladas de CO₂
-            - **Cobertura**: ~200 países y territorios
-            - **Variables**: País, código ISO3, año, emisiones totales
-            """)
-        
-        with col2:
-            st.markdown("""
-            **2. CO₂ emissions from fossil fuels and land-use change**
-            - **Fuente**: [Our World in Data](https://ourworldindata.org/co2-emissions)
-            - **Periodo**: 1750 - 2024
-            - **Unidad**: Toneladas de CO₂
-            - **Variables**: Emisiones totales, combustibles fósiles, cambio de uso de suelo
-            """)
-        
-        # Visualizaciones OWID
-        st.markdown("---")
-        st.subheader("🎨 Visualizaciones inspiradas en Our World in Data")
-        
+
+    with col2:
         st.markdown("""
-        Esta aplicación recrea y adapta 4 visualizaciones clave de OWID:
-        
-        1. **Mapa coroplético por país**
-           - Original: [Annual CO₂ emissions by region](https://ourworldindata.org/grapher/annual-co2-emissions-per-country)
-           - Adaptación: Mapa interactivo con selector de año y países sin datos en gris
-           
-        2. **Evolución temporal**
-           - Original: [Annual total CO₂ emissions](https://ourworldindata.org/grapher/annual-co2-emissions-per-country?country=~OWID_WRL)
-           - Adaptación: Gráfico de línea con rangeslider y opción de filtrado por países
-           
-        3. **Emisiones por tipo**
-           - Original: [Annual CO₂ emissions by source](https://ourworldindata.org/grapher/co2-fossil-plus-land-use)
-           - Adaptación: Barras horizontales acumuladas con control de año mediante slider
-           
-        4. **Evolución por región**
-           - Original: [Share of global CO₂ emissions](https://ourworldindata.org/grapher/annual-co-emissions-by-region)
-           - Adaptación: Área apilada normalizada al 100% con selector de países
+        **2. CO₂ emissions from fossil fuels and land-use change**
+        - **Fuente**: [Our World in Data](https://ourworldindata.org/co2-emissions)
+        - **Periodo**: 1750 - 2024
+        - **Unidad**: Toneladas de CO₂
+        - **Variables**: Emisiones totales, combustibles fósiles, cambio de uso de suelo
         """)
-        
-        # Decisiones de diseño
-        st.markdown("---")
-        st.subheader("🎯 Decisiones de diseño")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("""
-            **1. Paleta de colores**
-            - **Azul (#3498DB)**: Emisiones globales (neutralidad)
-            - **Rojo (#E74C3C)**: Emisiones totales (alerta)
-            - **Verde (#2ECC71)**: Cambio uso de suelo (naturaleza)
-            - **Escala Reds**: Mapa coroplético (intensidad creciente)
-            
-            **Justificación**: Colores intuitivos que facilitan la interpretación 
-            inmediata del tipo de dato y su gravedad.
-            """)
-        
-        with col2:
-            st.markdown("""
-            **2. Escalas y ejes**
-            - **Escala lineal**: Para emisiones absolutas (toneladas)
-            - **Normalización al 100%**: Para comparación de participación regional
-            - **Grillas sutiles**: Líneas grises discontinuas para referencia sin saturar
-            
-            **Justificación**: Facilita comparaciones cuantitativas precisas y 
-            visualización de proporciones sin distorsión.
-            """)
-        
-        # Limitaciones
-        st.markdown("---")
-        st.subheader("⚠️ Limitaciones y consideraciones")
-        
-        st.warning("""
-        **Países sin datos**
-        - Algunos países no tienen datos para todos los años, especialmente antes de 1900
-        - Los países sin datos se muestran en gris en el mapa
-        
-        **Agregaciones**
-        - Los totales globales pueden incluir estimaciones para países sin datos completos
-        - Las sumas por tipo de emisión pueden no coincidir exactamente debido a redondeos
-        
-        **Periodicidad**
-        - Los datos más recientes (2023-2024) pueden estar sujetos a revisiones
-        - Algunos países reportan con retraso, afectando la completitud de años recientes
-        """)
-        
-        # Metodología
-        st.markdown("---")
-        st.subheader("🔬 Metodología técnica")
-        
+
+    # Visualizaciones OWID
+    st.markdown("---")
+    st.subheader("🎨 Visualizaciones inspiradas en Our World in Data")
+
+    st.markdown("""
+    Esta aplicación recrea y adapta 4 visualizaciones clave de OWID:
+
+    1. **Mapa coroplético por país**
+       - Original: [Annual CO₂ emissions by region](https://ourworldindata.org/grapher/annual-co2-emissions-per-country)
+       - Adaptación: Mapa interactivo con selector de año y países sin datos en gris
+
+    2. **Evolución temporal**
+       - Original: [Annual total CO₂ emissions](https://ourworldindata.org/grapher/annual-co2-emissions-per-country?country=~OWID_WRL)
+       - Adaptación: Gráfico de línea con rangeslider y opción de filtrado por países
+
+    3. **Emisiones por tipo**
+       - Original: [Annual CO₂ emissions by source](https://ourworldindata.org/grapher/co2-fossil-plus-land-use)
+       - Adaptación: Barras horizontales acumuladas con control de año mediante slider
+
+    4. **Evolución por región**
+       - Original: [Share of global CO₂ emissions](https://ourworldindata.org/grapher/annual-co-emissions-by-region)
+       - Adaptación: Área apilada normalizada al 100% con selector de países
+    """)
+
+    # Decisiones de diseño
+    st.markdown("---")
+    st.subheader("🎯 Decisiones de diseño")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
         st.markdown("""
-        **Herramientas utilizadas:**
-        - **Streamlit**: Framework web interactivo
-        - **Plotly**: Visualizaciones interactivas
-        - **GeoPandas**: Procesamiento de datos geoespaciales
-        - **Pandas**: Manipulación y análisis de datos
-        
-        **Procesamiento de datos:**
-        1. Carga de shapefiles Natural Earth (50m resolution)
-        2. Estandarización de códigos ISO3 para unión de datos
-        3. Agregación temporal y espacial según visualización
-        4. Cálculo de porcentajes y normalizaciones
-        
-        **Optimizaciones:**
-        - Cache de datos con `@st.cache_data`
-        - Filtrado dinámico según controles del usuario
-        - Renderizado condicional de visualizaciones
+        **1. Paleta de colores**
+        - **Azul (#3498DB)**: Emisiones globales (neutralidad)
+        - **Rojo (#E74C3C)**: Emisiones totales (alerta)
+        - **Verde (#2ECC71)**: Cambio uso de suelo (naturaleza)
+        - **Escala Reds**: Mapa coroplético (intensidad creciente)
+
+        **Justificación**: Colores intuitivos que facilitan la interpretación 
+        inmediata del tipo de dato y su gravedad.
         """)
-        
-        # Fuentes y referencias
-        st.markdown("---")
-        st.subheader("📖 Fuentes y referencias")
-        
+
+    with col2:
         st.markdown("""
-        - [Our World in Data - CO₂ and Greenhouse Gas Emissions](https://ourworldindata.org/co2-emissions)
-        - [Natural Earth - Country Boundaries](https://www.naturalearthdata.com/)
-        - [Global Carbon Project](https://www.globalcarbonproject.org/)
-        - [Plotly Documentation](https://plotly.com/python/)
-        - [Streamlit Documentation](https://docs.streamlit.io/)
-        """)
-        
-        # Uso de IA
-        st.markdown("---")
-        st.info("""
-        **📝 Declaración de uso de IA**
-        
-        Esta aplicación fue desarrollada con asistencia de GitHub Copilot para:
-        - Generación de código base de Streamlit y Plotly
-        - Optimización de queries de pandas y geopandas
-        - Estructuración de layout y componentes interactivos
-        - Documentación y comentarios en código
-        
-        Todo el código fue revisado, adaptado y probado manualmente para asegurar 
-        su correcta funcionalidad y alineación con los requisitos del proyecto.
+        **2. Escalas y ejes**
+        - **Escala lineal**: Para emisiones absolutas (toneladas)
+        - **Normalización al 100%**: Para comparación de participación regional
+        - **Grillas sutiles**: Líneas grises discontinuas para referencia sin saturar
+
+        **Justificación**: Facilita comparaciones cuantitativas precisas y 
+        visualización de proporciones sin distorsión.
         """)
 
+    # Limitaciones
+    st.markdown("---")
+    st.subheader("⚠️ Limitaciones y consideraciones")
+
+    st.warning("""
+    **Países sin datos**
+    - Algunos países no tienen datos para todos los años, especialmente antes de 1900
+    - Los países sin datos se muestran en gris en el mapa
+
+    **Agregaciones**
+    - Los totales globales pueden incluir estimaciones para países sin datos completos
+    - Las emisiones por tipo usan la serie "World" de OWID; continentes y grupos de ingreso no se suman a los países
+    - Las sumas por tipo de emisión pueden no coincidir exactamente debido a redondeos
+
+    **Periodicidad**
+    - Los datos más recientes (2023-2024) pueden estar sujetos a revisiones
+    - Algunos países reportan con retraso, afectando la completitud de años recientes
+    """)
+
+    # Metodología
+    st.markdown("---")
+    st.subheader("🔬 Metodología técnica")
+
+    st.markdown("""
+    **Herramientas utilizadas:**
+    - **Streamlit**: Framework web interactivo
+    - **Plotly**: Visualizaciones interactivas
+    - **GeoPandas**: Procesamiento de datos geoespaciales
+    - **Pandas**: Manipulación y análisis de datos
+
+    **Procesamiento de datos:**
+    1. Carga de shapefiles Natural Earth (50m resolution)
+    2. Estandarización de códigos ISO3 para unión de datos
+    3. Agregación temporal y espacial según visualización
+    4. Cálculo de porcentajes y normalizaciones
+
+    **Optimizaciones:**
+    - Datos compartidos entre sesiones con `@st.cache_resource` y tablas Arrow con memory map
+    - Filtrado dinámico según controles del usuario
+    - Renderizado condicional de visualizaciones
+    """)
+
+    # Fuentes y referencias
+    st.markdown("---")
+    st.subheader("📖 Fuentes y referencias")
+
+    st.markdown("""
+    - [Our World in Data - CO₂ and Greenhouse Gas Emissions](https://ourworldindata.org/co2-emissions)
+    - [Natural Earth - Country Boundaries](https://www.naturalearthdata.com/)
+    - [Global Carbon Project](https://www.globalcarbonproject.org/)
+    - [Plotly Documentation](https://plotly.com/python/)
+    - [Streamlit Documentation](https://docs.streamlit.io/)
+    """)
+
+    # Uso de IA
+    st.markdown("---")
+    st.info("""
+    **📝 Declaración de uso de IA**
+
+    Esta aplicación fue desarrollada con asistencia de GitHub Copilot para:
+    - Generación de código base de Streamlit y Plotly
+    - Optimización de queries de pandas y geopandas
+    - Estructuración de layout y componentes interactivos
+    - Documentación y comentarios en código
+
+    Todo el código fue revisado, adaptado y probado manualmente para asegurar 
+    su correcta funcionalidad y alineación con los requisitos del proyecto.
+    """)
+
+
+# ============================
+# modo estático
+# ============================
+# las pestañas leen del paquete de export.py: los controles solo ofrecen
+# los parámetros exportados (cada año, los rangos predefinidos y los
+# países preseleccionados) y no se carga ningún dato
+@st.cache_resource(max_entries=1)
+def load_bundle_manifest(bundle_dir: str, stamp: int = 0) -> dict:
+    """
+    manifest del paquete con las entradas como conjuntos; `stamp` (ver
+    bundle.manifest_stamp) lo vuelve a leer si se regenera el paquete
+    """
+    manifest = read_manifest(bundle_dir)
+    manifest['figures'] = frozenset(manifest['figures'])
+    manifest['tables'] = frozenset(manifest['tables'])
+
+    return manifest
+
+
+def format_range(year_range: tuple) -> str:
+    return f'{year_range[0]}–{year_range[1]}'
+
+
+def show_bundle_figure(bundle: dict, name: str, profiler: RerunProfiler):
+    if name not in bundle['figures']:
+        st.warning(f'el paquete no incluye la figura {name}; vuelve a generarlo con export.py')
+        return
+
+    show_figure(
+        ('bundle', bundle['created_at'], name),
+        lambda: read_bundle_text(BUNDLE_DIR, FIGURES_DIR, name),
+        profiler
+    )
+
+
+def show_bundle_table(bundle: dict, name: str, kind: str, profiler: RerunProfiler):
+    if name not in bundle['tables']:
+        st.warning(f'el paquete no incluye la tabla {name}; vuelve a generarlo con export.py')
+        return
+
+    with profiler.stage(STAGE_TABLE_BUILD, step='paquete'):
+        df_table = pd.read_json(
+            io.StringIO(read_bundle_text(BUNDLE_DIR, TABLES_DIR, name)),
+            orient='split',
+            dtype=False,
+            convert_dates=False
+        )
+
+    show_table(df_table, TABLE_FORMATS[kind], key=f'table_{kind}', profiler=profiler)
+
+
+def show_bundle_map_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña del mapa desde el paquete: cada año exportado, en la
+    resolución del paquete
+    """
+    bundle = data['bundle']
+    years = bundle['map']['years']
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('controles')
+
+    años_destacados = [a for a in MAP_HIGHLIGHT_YEARS if a in years]
+
+    preset = st.sidebar.selectbox(
+        'años destacados',
+        options=['ninguno'] + [str(a) for a in años_destacados],
+        index=0
+    )
+
+    year = st.sidebar.select_slider(
+        'año',
+        options=years,
+        value=int(preset) if preset != 'ninguno' else years[-1]
+    )
+
+    map_modes = [MAP_MODE_SERVER]
+    if entry_name('map_frames') in bundle['figures']:
+        map_modes.append(MAP_MODE_BROWSER)
+    map_mode = st.sidebar.radio('modo del mapa', options=map_modes)
+
+    st.sidebar.caption(f"resolución del mapa: {bundle['map']['resolution']} (la del paquete)")
+
+    st.header("Emisiones de CO₂ por país")
+
+    if map_mode == MAP_MODE_BROWSER:
+        show_bundle_figure(bundle, entry_name('map_frames'), profiler)
+        st.caption('usa ▶ o el slider bajo el mapa para recorrer los años; la tabla sigue el año del sidebar.')
+    else:
+        show_bundle_figure(bundle, entry_name('map', year), profiler)
+
+    st.markdown('---')
+    st.subheader('tabla de emisiones por país en el año seleccionado')
+    show_bundle_table(bundle, entry_name('map', year), 'map', profiler)
+
+
+def show_bundle_temporal_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña de evolución temporal desde el paquete: rangos predefinidos,
+    global o con los países preseleccionados
+    """
+    bundle = data['bundle']
+    countries = bundle['countries']['line']
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Controles de rango temporal')
+
+    year_range = st.sidebar.selectbox(
+        'Rango de años',
+        options=[tuple(r) for r in bundle['ranges']],
+        format_func=format_range,
+        help='Rangos incluidos en el paquete estático'
+    )
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Filtro de países')
+
+    filter_countries = st.sidebar.checkbox(
+        'Mostrar países preseleccionados',
+        value=False,
+        help=', '.join(countries)
+    )
+
+    st.header("Evolución temporal de emisiones globales")
+
+    if filter_countries:
+        name = entry_name('line_countries', year_range)
+        show_bundle_figure(bundle, name, profiler)
+
+        st.markdown('---')
+        st.subheader(f'Tabla de emisiones por país y año ({year_range[0]}-{year_range[1]})')
+        show_bundle_table(bundle, name, 'countries', profiler)
+    else:
+        name = entry_name('line_global', year_range)
+        show_bundle_figure(bundle, name, profiler)
+
+        st.markdown('---')
+        st.subheader(f'tabla de emisiones totales por año ({year_range[0]}-{year_range[1]})')
+        show_bundle_table(bundle, name, 'global', profiler)
+
+
+def show_bundle_type_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña de emisiones por tipo desde el paquete: cada año de corte
+    """
+    bundle = data['bundle']
+    years = bundle['type_years']
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Controles de año')
+
+    year_selected = st.sidebar.select_slider(
+        'Acumular hasta año',
+        options=years,
+        value=2024 if 2024 in years else years[-1],
+        help='Selecciona hasta qué año se acumulan las emisiones'
+    )
+
+    st.header("Emisiones acumuladas por tipo")
+    show_bundle_figure(bundle, entry_name('type_bar', year_selected), profiler)
+
+    st.markdown('---')
+    st.subheader('tabla de emisiones por tipo y año')
+    show_bundle_table(bundle, entry_name('type_table'), 'type', profiler)
+
+
+def show_bundle_regions_tab(data: dict, versions: dict, profiler: RerunProfiler):
+    """
+    pestaña de evolución por región desde el paquete: rangos
+    predefinidos, top de países o países preseleccionados
+    """
+    bundle = data['bundle']
+    countries = bundle['countries']['regions']
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Controles de rango temporal')
+
+    year_range = st.sidebar.selectbox(
+        'Rango de años',
+        options=[tuple(r) for r in bundle['ranges']],
+        format_func=format_range,
+        help='Rangos incluidos en el paquete estático',
+        key='range_regions'
+    )
+
+    st.sidebar.markdown('---')
+    st.sidebar.header('Filtro de países')
+
+    filter_countries_regions = st.sidebar.checkbox(
+        'Mostrar países preseleccionados',
+        value=False,
+        help=f'{", ".join(countries)} en lugar del top {REGIONS_TOP_N}',
+        key='filter_regions'
+    )
+
+    st.header("Evolución de emisiones por región")
+
+    name = entry_name('area_countries' if filter_countries_regions else 'area_top', year_range)
+    show_bundle_figure(bundle, name, profiler)
+
+    st.markdown('---')
+    if filter_countries_regions:
+        st.subheader(f'Tabla de emisiones por país (países seleccionados)')
+    else:
+        st.subheader(f'Tabla de emisiones por país (top {REGIONS_TOP_N})')
+    show_bundle_table(bundle, name, 'regions', profiler)
+
+
+TAB_RENDERERS = {
+    'Mapa por país': show_map_tab,
+    'Evolución temporal': show_temporal_tab,
+    'Emisiones por tipo': show_type_tab,
+    'Evolución por región': show_regions_tab,
+    'Documentación': show_docs_tab,
+}
+
+BUNDLE_TAB_RENDERERS = {
+    'Mapa por país': show_bundle_map_tab,
+    'Evolución temporal': show_bundle_temporal_tab,
+    'Emisiones por tipo': show_bundle_type_tab,
+    'Evolución por región': show_bundle_regions_tab,
+    'Documentación': show_docs_tab,
+}
+
+
+@st.fragment
+def show_tab(tab: str, profiler: RerunProfiler):
+    """
+    ejecuta una pestaña como fragmento. en un rerun completo usa el
+    perfilador de main(); cuando el fragmento se ejecuta solo, el perfil
+    es nuevo. la versión de datos se lee en cada ejecución del fragmento:
+    tras una ingesta, el próximo movimiento de un control ya muestra los
+    datos nuevos sin esperar un rerun completo
+    """
+    profiler = profiler.for_fragment()
+
+    if BUNDLE_DIR:
+        # modo estático: solo se lee el manifest del paquete
+        with profiler.stage(STAGE_LOAD):
+            versions = {}
+            data = {'bundle': load_bundle_manifest(BUNDLE_DIR, manifest_stamp(BUNDLE_DIR))}
+    else:
+        # cargar solo los datos de la pestaña; el resto se precarga en segundo plano
+        with st.spinner('Cargando datos...'), profiler.stage(STAGE_LOAD):
+            versions = data_versions()
+            data = load_tab_data(tab, versions)
+        start_warmup(versions)
+
+    renderers = BUNDLE_TAB_RENDERERS if BUNDLE_DIR else TAB_RENDERERS
+    renderers[tab](data, versions, profiler)
+    show_rerun_footer(profiler)
+
+
+# ============================
+# app principal
+# ============================
+def main():
+    st.title('mapa interactivo de emisiones de co₂')
+    st.markdown(
+        """
+        esta aplicación muestra las emisiones anuales de co₂ por país usando datos de our world in data.
+        puedes explorar distintos años y comparar cómo cambia el mapa a lo largo del tiempo.
+        """
+    )
+
+    # perfil por rerun: ?profile=1 en la url o CO2_PROFILE=1
+    profiler = RerunProfiler('', enabled=is_enabled(st.query_params.get(PROFILE_QUERY_PARAM)))
+    if profiler.enabled:
+        configure_logging()
+
+    if DATA_SCALE:
+        st.sidebar.info(f'modo escala: datos sintéticos "{DATA_SCALE}"')
+
+    # selector de visualización en sidebar
+    st.sidebar.header('Navegación')
+    selected_tab = st.sidebar.radio(
+        'Selecciona una visualización:',
+        list(TAB_DATASETS),
+        label_visibility='collapsed'
+    )
+    profiler.tab = selected_tab
+
+    # carga de datos, controles y contenido de la pestaña: un fragmento
+    # que se vuelve a ejecutar solo cuando cambia uno de sus controles
+    show_tab(selected_tab, profiler)
+
 
 if __name__ == '__main__':
     main()
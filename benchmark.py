@@ -0,0 +1,444 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import plotly.io as pio
+
+import app
+from query_engine import ENGINE_DUCKDB, ENGINE_PANDAS, resolve_engine
+from transport import arrow_bytes, compact_table, gzip_bytes, uncompacted
+
+# ============================
+# benchmark sin navegador de las rutas críticas de la app
+# ============================
+# llama directamente a los loaders, consultas y constructores de app.py
+# (streamlit corre en modo "bare", sin servidor) y mide tiempo, memoria
+# máxima y tamaño de las figuras serializadas, más los bytes que cada
+# pestaña envía al navegador con y sin la compactación de transport.py
+
+# parámetros representativos por pestaña
+YEAR_RANGES = [(1750, 2024), (1900, 2024), (1990, 2024), (2020, 2024)]
+COUNTRY_SETS = [
+    ['China', 'United States', 'India', 'Russia', 'Japan'],
+    ['Chile', 'Argentina', 'Brazil'],
+]
+TYPE_YEARS = [1850, 1950, 2000, 2024]
+
+# presupuesto de arranque: tiempo de `import app` en un proceso nuevo
+STARTUP_BUDGET_MS = 1500
+
+# módulos pesados que app.py importa solo cuando una pestaña los necesita
+DEFERRED_MODULES = [
+    'geopandas', 'shapely', 'pyproj', 'fiona', 'pyogrio', 'plotly.express', 'plotly.graph_objects',
+    'duckdb', 'pyarrow.dataset',
+]
+
+
+def measure(name: str, fn, params: dict = None, repeat: int = 3) -> dict:
+    """
+    ejecuta fn una vez bajo tracemalloc (memoria máxima) y `repeat` veces
+    más para el tiempo. si fn devuelve una figura plotly (o su json), mide
+    el json
+    """
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+
+    record = {
+        'name': name,
+        'params': params or {},
+        'runs': repeat,
+        'wall_ms_mean': 1000 * float(np.mean(times)),
+        'wall_ms_min': 1000 * float(np.min(times)),
+        'wall_ms_max': 1000 * float(np.max(times)),
+        'peak_mem_kb': peak / 1024,
+    }
+
+    if hasattr(result, 'to_plotly_json'):
+        start = time.perf_counter()
+        fig_json = pio.to_json(result, validate=False)
+        record['serialize_ms'] = 1000 * (time.perf_counter() - start)
+        record['fig_bytes'] = len(fig_json.encode('utf-8'))
+    elif isinstance(result, str):
+        # figura ya serializada (el tiempo de serialización va en wall_ms)
+        record['fig_bytes'] = len(result.encode('utf-8'))
+
+    return record
+
+
+def measure_cold(name: str, loader, *args) -> dict:
+    """
+    tiempo de un loader cacheado con la caché de streamlit vacía
+    (las cachés en disco de data/processed se mantienen)
+    """
+    def run():
+        loader.clear()
+        return loader(*args)
+
+    return measure(name, run, {'args': [os.path.basename(str(a)) for a in args]}, repeat=1)
+
+
+def summarize(name: str, records: list, params: dict = None) -> dict:
+    """
+    resume varias mediciones (p. ej. el mapa de todos los años) en una
+    """
+    walls = np.array([r['wall_ms_mean'] for r in records])
+    summary = {
+        'name': name,
+        'params': params or {},
+        'runs': len(records),
+        'wall_ms_mean': float(walls.mean()),
+        'wall_ms_p95': float(np.percentile(walls, 95)),
+        'wall_ms_max': float(walls.max()),
+        'wall_ms_total': float(walls.sum()),
+        'peak_mem_kb': max(r['peak_mem_kb'] for r in records),
+    }
+    if 'fig_bytes' in records[0]:
+        summary['fig_bytes_mean'] = float(np.mean([r['fig_bytes'] for r in records]))
+    if 'serialize_ms' in records[0]:
+        summary['serialize_ms_mean'] = float(np.mean([r['serialize_ms'] for r in records]))
+
+    return summary
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=app.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure_startup(budget_ms: float = STARTUP_BUDGET_MS) -> dict:
+    """
+    importa app en un proceso nuevo con `python -X importtime` y resume
+    el tiempo acumulado del import, los imports directos más caros y los
+    módulos diferidos que igual se cargaron (debería no haber ninguno).
+    los que ya carga `import streamlit` por su cuenta (p. ej.
+    plotly.graph_objects, para su tema de plotly) se informan aparte:
+    no dependen de app.py
+    """
+    code = 'import sys, {}; print(",".join(m for m in ' + repr(DEFERRED_MODULES) + ' if m in sys.modules))'
+    by_streamlit = subprocess.run(
+        [sys.executable, '-c', code.format('streamlit')],
+        cwd=app.BASE_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip().split(',')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code.format('app')],
+        cwd=app.BASE_DIR, capture_output=True, text=True, check=True
+    )
+
+    # líneas "import time: propio | acumulado | nombre", con dos espacios de sangría por nivel
+    direct = []
+    import_ms = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        if depth == 0 and name.strip() == 'app':
+            import_ms = int(cumulative) / 1000
+            break
+        if depth == 0:
+            direct = []
+        elif depth == 1:
+            direct.append((name.strip(), int(cumulative) / 1000))
+
+    loaded = [m for m in proc.stdout.strip().split(',') if m]
+
+    return {
+        'name': 'startup',
+        'budget_ms': budget_ms,
+        'import_ms': import_ms,
+        'within_budget': import_ms is not None and import_ms <= budget_ms,
+        'top_imports': [{'module': m, 'ms': ms} for m, ms in sorted(direct, key=lambda x: -x[1])[:8]],
+        'deferred_loaded': [m for m in loaded if m not in by_streamlit],
+        'loaded_by_streamlit': [m for m in loaded if m in by_streamlit],
+    }
+
+
+def print_startup(startup: dict):
+    status = 'dentro' if startup['within_budget'] else 'FUERA'
+    print(f"arranque: import app {startup['import_ms']:.0f} ms "
+          f"({status} del presupuesto de {startup['budget_ms']:.0f} ms)")
+    for item in startup['top_imports']:
+        print(f"  {item['module']:<30} {item['ms']:9.1f} ms")
+    if startup['deferred_loaded']:
+        print(f"  módulos diferidos cargados al importar: {', '.join(startup['deferred_loaded'])}")
+    if startup['loaded_by_streamlit']:
+        print(f"  ya cargados por streamlit: {', '.join(startup['loaded_by_streamlit'])}")
+
+
+def run_benchmarks(map_resolutions: list,
+                   map_years_step: int = 1,
+                   repeat: int = 3,
+                   engine_name: str = app.QUERY_ENGINE) -> list:
+    results = []
+
+    # carga de datos
+    results.append(measure_cold('load_world', app.load_world, app.SHP_PATH))
+    results.append(measure_cold('load_emissions', app.load_emissions, app.CSV_PATH))
+    results.append(measure_cold('load_fossil_emissions', app.load_fossil_emissions, app.CSV_FOSSIL_PATH))
+    results.append(measure_cold('load_emissions_cube', app.load_emissions_cube, app.CSV_PATH))
+    results.append(measure_cold('load_fossil_index', app.load_fossil_index, app.CSV_FOSSIL_PATH))
+    results.append(measure_cold('load_map_assets', app.load_map_assets, app.CSV_PATH, app.SHP_PATH))
+
+    map_assets = app.load_map_assets(app.CSV_PATH, app.SHP_PATH)
+    co2_cube = app.load_emissions_cube(app.CSV_PATH)
+    fossil_index = app.load_fossil_index(app.CSV_FOSSIL_PATH)
+    engine = app.load_query_engine(app.CSV_PATH, app.CSV_FOSSIL_PATH, engine_name)
+
+    # mapa: cada año, por nivel de resolución
+    years = [int(y) for y in co2_cube['years'][::map_years_step]]
+    for resolution in map_resolutions:
+        results.append(measure_cold(f'load_world_geojson[{resolution}]', app.load_world_geojson, app.SHP_PATH, resolution))
+        geojson_map = app.load_world_geojson(app.SHP_PATH, resolution)
+
+        per_year = [
+            measure('make_co2_map', lambda y=y: app.make_co2_map(map_assets, geojson_map, y), repeat=1)
+            for y in years
+        ]
+        results.append(summarize('make_co2_map', per_year, {'resolution': resolution, 'years': len(years)}))
+
+        geojson_text = app.load_world_geojson_text(app.SHP_PATH, resolution)
+        per_year = [
+            measure('make_co2_map_json', lambda y=y: app.make_co2_map_json(map_assets, geojson_text, y), repeat=1)
+            for y in years
+        ]
+        results.append(summarize('make_co2_map_json', per_year, {'resolution': resolution, 'years': len(years)}))
+
+        results.append(measure(
+            'make_co2_map_frames',
+            lambda: app.make_co2_map_frames(map_assets, geojson_map),
+            {'resolution': resolution},
+            repeat=1
+        ))
+
+    per_year = [measure('query_map_year', lambda y=y: app.query_map_year(co2_cube, y, engine), repeat=1) for y in years]
+    results.append(summarize('query_map_year', per_year, {'years': len(years), 'engine': engine_name}))
+    per_year = [
+        measure('make_map_table', lambda df=app.query_map_year(co2_cube, y, engine): app.make_map_table(df), repeat=1)
+        for y in years
+    ]
+    results.append(summarize('make_map_table', per_year, {'years': len(years)}))
+
+    # evolución temporal
+    for year_range in YEAR_RANGES:
+        params = {'year_range': list(year_range), 'engine': engine_name}
+        results.append(measure(
+            'query_global_by_year',
+            lambda r=year_range: app.query_global_by_year(co2_cube, r, engine=engine),
+            params, repeat
+        ))
+        df_total = app.query_global_by_year(co2_cube, year_range, engine=engine)
+        results.append(measure('make_global_line', lambda r=year_range: app.make_global_line(df_total, r), params, repeat))
+        results.append(measure('make_global_table', lambda: app.make_global_table(df_total), params, repeat))
+
+        for countries in COUNTRY_SETS:
+            params = {'year_range': list(year_range), 'countries': countries, 'engine': engine_name}
+            results.append(measure(
+                'query_countries_by_year',
+                lambda r=year_range, c=countries: app.query_countries_by_year(co2_cube, c, r, engine=engine),
+                params, repeat
+            ))
+            df_by_country = app.query_countries_by_year(co2_cube, countries, year_range, engine=engine)
+            results.append(measure('make_countries_line', lambda r=year_range: app.make_countries_line(df_by_country, r), params, repeat))
+            results.append(measure('make_countries_table', lambda: app.make_countries_table(df_by_country), params, repeat))
+
+    # emisiones por tipo
+    for year in TYPE_YEARS:
+        params = {'year': year, 'engine': engine_name}
+        results.append(measure(
+            'query_type_totals',
+            lambda y=year: app.query_type_totals(fossil_index, y, engine=engine),
+            params, repeat
+        ))
+        totals = app.query_type_totals(fossil_index, year, engine=engine)
+        results.append(measure('make_type_bar', lambda y=year: app.make_type_bar(totals, y), params, repeat))
+    results.append(measure('make_type_table', lambda: app.make_type_table(fossil_index['totals']), repeat=repeat))
+
+    # evolución por región
+    for year_range in YEAR_RANGES:
+        for countries in [None] + COUNTRY_SETS:
+            params = {'year_range': list(year_range), 'countries': countries, 'engine': engine_name}
+            results.append(measure(
+                'query_regional',
+                lambda r=year_range, c=countries: app.query_regional(co2_cube, r, c, engine=engine),
+                params, repeat
+            ))
+            df_pivot, df_top, title_suffix = app.query_regional(co2_cube, year_range, countries, engine=engine)
+            results.append(measure('make_regions_area', lambda: app.make_regions_area(df_pivot, title_suffix), params, repeat))
+            results.append(measure('make_regions_table', lambda: app.make_regions_table(df_top), params, repeat))
+
+    return results
+
+
+def tab_payloads(resolution: str) -> dict:
+    """
+    figura (json) y primera página de la tabla de cada pestaña con sus
+    parámetros por defecto, tal como se envían al navegador con el modo
+    de transporte activo. la geometría y los arreglos del mapa se arman
+    de nuevo (sin las cachés en disco) para poder comparar ambos modos
+    """
+    cube = app.load_emissions_cube(app.CSV_PATH)
+    fossil_index = app.load_fossil_index(app.CSV_FOSSIL_PATH)
+    labels = app.map_labels(app.country_table(cube, app.load_world(app.SHP_PATH)))
+
+    assets = app.map_assets(cube, labels)
+    geojson_map = app.build_world_geojson(app.SHP_PATH, resolution)
+    geojson_text = json.dumps(geojson_map, separators=(',', ':'))
+
+    year = int(cube['years'][-1])
+    year_range = (int(cube['years'][0]), year)
+    type_year = int(fossil_index['years'][-1])
+    df_total = app.query_global_by_year(cube, year_range)
+    df_pivot, df_top, title_suffix = app.query_regional(cube, year_range)
+
+    def page(df, kind):
+        formats = app.TABLE_FORMATS[kind]
+        return compact_table(app.table_page(df, formats), formats)
+
+    return {
+        'Mapa por país': (
+            app.make_co2_map_json(assets, geojson_text, year),
+            page(app.make_map_table(app.query_map_year(cube, year)), 'map'),
+        ),
+        'Mapa por país (animación)': (
+            pio.to_json(app.make_co2_map_frames(assets, geojson_map), validate=False),
+            None,
+        ),
+        'Evolución temporal': (
+            pio.to_json(app.make_global_line(df_total, year_range), validate=False),
+            page(app.make_global_table(df_total), 'global'),
+        ),
+        'Emisiones por tipo': (
+            pio.to_json(app.make_type_bar(app.query_type_totals(fossil_index, type_year), type_year), validate=False),
+            page(app.make_type_table(fossil_index['totals']), 'type'),
+        ),
+        'Evolución por región': (
+            pio.to_json(app.make_regions_area(df_pivot, title_suffix), validate=False),
+            page(app.make_regions_table(df_top), 'regions'),
+        ),
+    }
+
+
+def measure_transport(resolution: str) -> list:
+    """
+    bytes de la figura (json y json con gzip) y de la página de tabla
+    (arrow) de cada pestaña, sin y con compactación
+    """
+    with uncompacted():
+        full = tab_payloads(resolution)
+    compact = tab_payloads(resolution)
+
+    results = []
+    for tab, (fig_json, table) in compact.items():
+        full_json, full_table = full[tab]
+        result = {
+            'name': 'transport',
+            'tab': tab,
+            'params': {'resolution': resolution},
+            'figure_bytes': len(full_json),
+            'figure_bytes_compact': len(fig_json),
+            'figure_gzip_bytes': gzip_bytes(full_json),
+            'figure_gzip_bytes_compact': gzip_bytes(fig_json),
+            'table_bytes': arrow_bytes(full_table) if table is not None else 0,
+            'table_bytes_compact': arrow_bytes(table) if table is not None else 0,
+        }
+        result['bytes_saved'] = (
+            result['figure_bytes'] + result['table_bytes']
+            - result['figure_bytes_compact'] - result['table_bytes_compact']
+        )
+        results.append(result)
+
+    return results
+
+
+def print_transport(transport: list):
+    print(f"{'envío por pestaña':<28} {'figura kb':>19} {'con gzip kb':>19} {'tabla kb':>15} {'ahorro':>8}")
+    for r in transport:
+        total = r['figure_bytes'] + r['table_bytes']
+        print(
+            f"{r['tab']:<28} "
+            f"{r['figure_bytes'] / 1024:8.1f} → {r['figure_bytes_compact'] / 1024:8.1f} "
+            f"{r['figure_gzip_bytes'] / 1024:8.1f} → {r['figure_gzip_bytes_compact'] / 1024:8.1f} "
+            f"{r['table_bytes'] / 1024:6.1f} → {r['table_bytes_compact'] / 1024:6.1f} "
+            f"{100 * r['bytes_saved'] / total:7.1f}%"
+        )
+
+
+def print_summary(results: list):
+    print(f"{'medición':<34} {'ms (media)':>11} {'mem kb':>10} {'fig kb':>9}  parámetros")
+    for r in results:
+        fig_bytes = r.get('fig_bytes', r.get('fig_bytes_mean'))
+        fig_kb = f'{fig_bytes / 1024:9.1f}' if fig_bytes is not None else ' ' * 9
+        params = json.dumps(r['params'], ensure_ascii=False)
+        print(f"{r['name']:<34} {r['wall_ms_mean']:11.2f} {r['peak_mem_kb']:10.0f} {fig_kb}  {params}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark sin navegador de carga y render de la app')
+    parser.add_argument('--output', help='archivo json donde guardar los resultados')
+    parser.add_argument('--resolution', action='append', choices=list(app.MAP_RESOLUTIONS),
+                        help='resolución del mapa a medir (repetible; por defecto la de la app)')
+    parser.add_argument('--map-years-step', type=int, default=1,
+                        help='medir el mapa cada n años (1 = todos los años)')
+    parser.add_argument('--repeat', type=int, default=3, help='repeticiones por medición')
+    parser.add_argument('--startup-budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                        help='presupuesto del tiempo de import de app en un proceso nuevo')
+    parser.add_argument('--startup-only', action='store_true',
+                        help='medir solo el arranque (sale con código 1 si excede el presupuesto)')
+    parser.add_argument('--engine', choices=[ENGINE_PANDAS, ENGINE_DUCKDB], default=app.QUERY_ENGINE,
+                        help='motor de consultas a medir')
+    args = parser.parse_args()
+
+    startup = measure_startup(args.startup_budget_ms)
+    print_startup(startup)
+    if args.startup_only:
+        sys.exit(0 if startup['within_budget'] and not startup['deferred_loaded'] else 1)
+
+    results = run_benchmarks(
+        args.resolution or [app.MAP_RESOLUTION_DEFAULT],
+        map_years_step=args.map_years_step,
+        repeat=args.repeat,
+        engine_name=resolve_engine(args.engine)
+    )
+    print_summary(results)
+
+    transport = [r for resolution in args.resolution or [app.MAP_RESOLUTION_DEFAULT]
+                 for r in measure_transport(resolution)]
+    print_transport(transport)
+
+    if args.output:
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'startup': startup,
+            'results': results,
+            'transport': transport,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'resultados guardados en {args.output}')
+
+
+if __name__ == '__main__':
+    main()
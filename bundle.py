@@ -0,0 +1,86 @@
+import gzip
+import json
+import os
+
+# ============================
+# paquete estático del dashboard
+# ============================
+# export.py escribe en una carpeta todas las figuras (json de plotly) y
+# tablas de cada pestaña para un conjunto acotado de parámetros, más un
+# manifest.json con esos parámetros. la carpeta se puede servir tal cual
+# desde un servidor estático o un cdn, y la app la lee con CO2_BUNDLE=<carpeta>
+# sin cargar datos ni calcular nada
+BUNDLE_ENV_VAR = 'CO2_BUNDLE'
+MANIFEST_FILE = 'manifest.json'
+BUNDLE_FORMAT_VERSION = 1
+
+# subcarpetas de figuras y tablas; cada entrada es <sección>/<nombre>.json.gz
+FIGURES_DIR = 'figures'
+TABLES_DIR = 'tables'
+
+# nivel de gzip de los archivos del paquete (se escriben una vez y se sirven muchas)
+BUNDLE_COMPRESSION = 9
+
+
+def entry_name(kind: str, param=None) -> str:
+    """
+    nombre de una entrada del paquete: tipo de figura y su parámetro
+    (año, o rango como inicio-fin), p. ej. map/2024 o area_top/1950-2024
+    """
+    if param is None:
+        return kind
+    if isinstance(param, (tuple, list)):
+        return f'{kind}/{int(param[0])}-{int(param[1])}'
+    return f'{kind}/{int(param)}'
+
+
+def bundle_file(bundle_dir: str, section: str, name: str) -> str:
+    return os.path.join(bundle_dir, section, f'{name}.json.gz')
+
+
+def write_bundle_text(bundle_dir: str, section: str, name: str, text: str):
+    path = bundle_file(bundle_dir, section, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # mtime=0: el mismo contenido da el mismo archivo (etags estables en el cdn)
+    with open(path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb',
+                                                compresslevel=BUNDLE_COMPRESSION, mtime=0) as f:
+        f.write(text.encode('utf-8'))
+
+
+def read_bundle_text(bundle_dir: str, section: str, name: str):
+    """
+    json de una entrada del paquete, o None si no está
+    """
+    try:
+        with gzip.open(bundle_file(bundle_dir, section, name), 'rt', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(bundle_dir: str) -> dict:
+    path = os.path.join(bundle_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'{bundle_dir} no es un paquete estático (falta {MANIFEST_FILE}; ver export.py)')
+
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f'paquete en formato {manifest.get("format")}, la app lee el formato {BUNDLE_FORMAT_VERSION}: '
+            f'vuelve a generarlo con export.py'
+        )
+
+    return manifest
+
+
+def manifest_stamp(bundle_dir: str) -> int:
+    """
+    cambia cada vez que se regenera el paquete (para las claves de caché);
+    0 si no hay manifest
+    """
+    try:
+        return os.stat(os.path.join(bundle_dir, MANIFEST_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,316 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# ============================
+# caché columnar de los csv de owid
+# ============================
+BASE_DIR = os.path.dirname(__file__)
+RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed')
+
+# subir este número invalida todas las cachés si cambia el formato
+CACHE_FORMAT_VERSION = 3
+
+# columnas de texto que se guardan como categóricas
+CATEGORICAL_COLUMNS = ['Entity', 'Code']
+
+# versión de cada csv fuente, subida por cada ingesta incremental (ver ingest.py)
+DATA_VERSION_FILE = 'data_version.json'
+
+
+def file_fingerprint(path: str, with_hash: bool = True) -> dict:
+    """
+    huella de un archivo fuente: tamaño, mtime y (opcional) sha256
+    del contenido
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    if with_hash:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        fingerprint['sha256'] = sha.hexdigest()
+
+    return fingerprint
+
+
+def sources_key(paths: list, *extra) -> str:
+    """
+    clave corta para artefactos derivados de varios archivos fuente:
+    cambia si cambia el tamaño o mtime de alguno, o los parámetros extra
+    """
+    sha = hashlib.sha256(str(CACHE_FORMAT_VERSION).encode())
+    for path in paths:
+        fingerprint = file_fingerprint(path, with_hash=False)
+        sha.update(f'{os.path.abspath(path)}:{fingerprint["size"]}:{fingerprint["mtime_ns"]}'.encode())
+    for value in extra:
+        sha.update(f':{value}'.encode())
+
+    return sha.hexdigest()[:16]
+
+
+def source_name(csv_path: str) -> str:
+    """
+    nombre de un csv fuente sin extensión (nombre de su caché y de su
+    entrada en DATA_VERSION_FILE)
+    """
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+
+def cache_paths(csv_path: str, processed_dir: str = PROCESSED_DIR):
+    """
+    rutas del archivo feather y de su metadata para un csv dado
+    """
+    name = source_name(csv_path)
+    return (
+        os.path.join(processed_dir, f'{name}.feather'),
+        os.path.join(processed_dir, f'{name}.meta.json')
+    )
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    reduce los tipos de un csv de owid:
+    - Entity / Code como categóricas
+    - Year como int16
+    - valores enteros sin nulos como int64, el resto como float64
+    """
+    df = df.copy()
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    if 'Year' in df.columns:
+        df['Year'] = df['Year'].astype('int16')
+
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS or col == 'Year':
+            continue
+        values = df[col]
+        if values.notna().all() and np.array_equal(values, np.round(values)):
+            df[col] = values.astype('int64')
+        else:
+            df[col] = values.astype('float64')
+
+    return df.reset_index(drop=True)
+
+
+def frame_to_table(df: pd.DataFrame) -> pa.Table:
+    """
+    convierte un dataframe a tabla arrow conservando los nan de las
+    columnas float como nan (no como nulos), para que al leerlas de
+    vuelta pandas pueda usar el buffer sin copiarlo
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values.dtype):
+            columns[col] = pa.array(values.to_numpy(), from_pandas=False)
+        else:
+            columns[col] = pa.Array.from_pandas(values)
+
+    return pa.table(columns)
+
+
+def write_frame(df: pd.DataFrame, path: str):
+    """
+    escribe un dataframe como feather sin comprimir (apto para memory map).
+    escribe a un temporal y renombra para no dejar archivos a medias
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(frame_to_table(df.reset_index(drop=True)), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def write_json(obj, path: str):
+    """
+    escribe un objeto como json (p. ej. un geojson), con el mismo
+    temporal + renombrado que write_frame
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    """
+    abre un feather con memory map. las columnas numéricas quedan como
+    vistas de solo lectura sobre el archivo, compartidas entre procesos
+    a través de la caché de páginas del sistema operativo
+    """
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+
+def _read_meta(meta_path: str):
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_meta(meta_path: str, fingerprint: dict):
+    meta = {'format_version': CACHE_FORMAT_VERSION, 'source': fingerprint}
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+
+def is_cache_fresh(csv_path: str, processed_dir: str = PROCESSED_DIR) -> bool:
+    """
+    indica si la caché columnar de un csv sigue vigente.
+    compara primero tamaño y mtime; si solo cambió el mtime,
+    confirma con el sha256 y actualiza la metadata
+    """
+    feather_path, meta_path = cache_paths(csv_path, processed_dir)
+    meta = _read_meta(meta_path)
+    if meta is None or not os.path.exists(feather_path):
+        return False
+    if meta.get('format_version') != CACHE_FORMAT_VERSION:
+        return False
+
+    cached = meta['source']
+    current = file_fingerprint(csv_path, with_hash=False)
+    if current['size'] != cached['size']:
+        return False
+    if current['mtime_ns'] == cached['mtime_ns']:
+        return True
+
+    # mismo tamaño, distinto mtime: decide el contenido
+    current = file_fingerprint(csv_path)
+    if current['sha256'] != cached.get('sha256'):
+        return False
+
+    _write_meta(meta_path, current)
+    return True
+
+
+def store_cache(csv_path: str, df: pd.DataFrame, processed_dir: str = PROCESSED_DIR) -> str:
+    """
+    guarda como caché columnar de un csv su contenido ya leído (df debe
+    ser lo que daría pd.read_csv del archivo actual), con la huella del
+    archivo al lado
+    """
+    os.makedirs(processed_dir, exist_ok=True)
+    feather_path, meta_path = cache_paths(csv_path, processed_dir)
+
+    fingerprint = file_fingerprint(csv_path)
+    write_frame(compact_frame(df), feather_path)
+    _write_meta(meta_path, fingerprint)
+
+    return feather_path
+
+
+def build_cache(csv_path: str, processed_dir: str = PROCESSED_DIR) -> str:
+    """
+    convierte un csv de owid a feather (arrow) compacto y guarda
+    la huella del archivo fuente al lado
+    """
+    return store_cache(csv_path, pd.read_csv(csv_path), processed_dir)
+
+
+def read_csv_cached(csv_path: str, processed_dir: str = PROCESSED_DIR) -> pd.DataFrame:
+    """
+    lee un csv de owid desde su caché columnar, reconstruyéndola
+    si el archivo fuente cambió. el feather se abre con memory map
+    """
+    if not is_cache_fresh(csv_path, processed_dir):
+        build_cache(csv_path, processed_dir)
+
+    feather_path, _ = cache_paths(csv_path, processed_dir)
+    return read_frame(feather_path)
+
+
+def derived_path(name: str,
+                 sources: list,
+                 build,
+                 processed_dir: str = PROCESSED_DIR,
+                 suffix: str = 'feather',
+                 write=write_frame,
+                 params: tuple = ()) -> str:
+    """
+    ruta del archivo de un artefacto derivado de uno o más archivos fuente
+    (por ejemplo, el csv ya limpio por los loaders de la app): un feather
+    por defecto, o lo que escriba `write` (p. ej. write_json).
+    build() solo se llama si cambió alguna fuente o alguno de `params`
+    """
+    key = sources_key(sources, name, *params)
+    path = os.path.join(processed_dir, f'{name}_{key}.{suffix}')
+
+    if not os.path.exists(path):
+        os.makedirs(processed_dir, exist_ok=True)
+        for old_path in glob.glob(os.path.join(processed_dir, f'{name}_*.{suffix}')):
+            os.remove(old_path)
+        write(build(), path)
+
+    return path
+
+
+def read_derived(name: str, sources: list, build, processed_dir: str = PROCESSED_DIR) -> pd.DataFrame:
+    """
+    tabla derivada (ver derived_path) abierta con memory map
+    """
+    return read_frame(derived_path(name, sources, build, processed_dir))
+
+
+def read_data_versions(processed_dir: str = PROCESSED_DIR) -> dict:
+    """
+    entradas de DATA_VERSION_FILE por csv fuente: {nombre: {'version': n,
+    ...detalle de la última ingesta}}. un csv nunca ingerido no aparece
+    (versión 0)
+    """
+    meta = _read_meta(os.path.join(processed_dir, DATA_VERSION_FILE))
+    return (meta or {}).get('sources', {})
+
+
+def bump_data_version(csv_path: str, changes: dict, processed_dir: str = PROCESSED_DIR) -> int:
+    """
+    sube en uno la versión de un csv fuente y guarda el detalle de la
+    ingesta (filas nuevas / modificadas, años afectados). devuelve la
+    nueva versión
+    """
+    sources = read_data_versions(processed_dir)
+    name = source_name(csv_path)
+    version = sources.get(name, {}).get('version', 0) + 1
+    sources[name] = {'version': version, **changes}
+
+    os.makedirs(processed_dir, exist_ok=True)
+    write_json({'sources': sources}, os.path.join(processed_dir, DATA_VERSION_FILE))
+
+    return version
+
+
+def preprocess_all(raw_dir: str = RAW_DIR, processed_dir: str = PROCESSED_DIR, force: bool = False):
+    """
+    etapa de preprocesamiento: convierte todos los data/raw/*/*.csv
+    """
+    for csv_path in sorted(glob.glob(os.path.join(raw_dir, '*', '*.csv'))):
+        if not force and is_cache_fresh(csv_path, processed_dir):
+            print(f'al día: {csv_path}')
+            continue
+        feather_path = build_cache(csv_path, processed_dir)
+        print(f'generado: {feather_path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='convierte los csv de owid en data/raw a feather en data/processed'
+    )
+    parser.add_argument('--force', action='store_true', help='regenera aunque la caché esté vigente')
+    args = parser.parse_args()
+
+    preprocess_all(force=args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import plotly.io as pio
+
+import app
+from bundle import (
+    BUNDLE_ENV_VAR, BUNDLE_FORMAT_VERSION, FIGURES_DIR, MANIFEST_FILE, TABLES_DIR, bundle_file, entry_name,
+    write_bundle_text
+)
+from data_store import source_name, write_json
+from figure_cache import stored_figure_path
+from precompute import build_figure, default_countries, figure_keys, load_data
+
+# ============================
+# exportación estática del dashboard
+# ============================
+# recorre cada pestaña con un conjunto acotado de parámetros (cada año
+# del mapa y de las barras por tipo, los rangos de precompute.py para
+# las líneas y el área, con y sin los países preseleccionados) y escribe
+# las figuras y sus tablas en un paquete servible desde un servidor
+# estático o un cdn (ver bundle.py). la app lo lee con CO2_BUNDLE=<carpeta>
+EXPORT_DIR = os.path.join(app.BASE_DIR, 'dist', 'bundle')
+
+
+def bundle_entry(key: tuple) -> str:
+    """
+    nombre en el paquete de una clave de precompute.figure_keys (sin la
+    versión de datos, que queda en el manifest)
+    """
+    kind = key[0]
+    if kind == 'map':
+        return entry_name('map', key[2])
+    if kind == 'area':
+        return entry_name('area_top' if key[3] is None else 'area_countries', key[2])
+
+    return entry_name(kind, key[2])
+
+
+def build_table(key: tuple, data: dict):
+    """
+    tabla que acompaña a la figura de `key` en su pestaña (None para las
+    barras por tipo: su tabla es la misma para todos los años)
+    """
+    kind = key[0]
+
+    if kind == 'map':
+        return app.make_map_table(app.query_map_year(data['cube'], key[2]))
+
+    if kind == 'line_global':
+        return app.make_global_table(app.query_global_by_year(data['cube'], key[2]))
+
+    if kind == 'line_countries':
+        _, _, year_range, countries = key
+        return app.make_countries_table(app.query_countries_by_year(data['cube'], list(countries), year_range))
+
+    if kind == 'area':
+        _, _, year_range, countries = key
+        _, df_top, _ = app.query_regional(data['cube'], year_range, list(countries) if countries else None)
+        return app.make_regions_table(df_top)
+
+    return None
+
+
+def table_json(df: pd.DataFrame) -> str:
+    return df.to_json(orient='split', index=False, double_precision=15)
+
+
+def figure_json(fig) -> str:
+    return fig if isinstance(fig, str) else pio.to_json(fig, validate=False)
+
+
+def export(bundle_dir: str = EXPORT_DIR,
+           resolution: str = app.MAP_RESOLUTION_DEFAULT,
+           frames: bool = True,
+           use_store: bool = True) -> dict:
+    """
+    genera el paquete en bundle_dir y devuelve su manifest. las figuras
+    ya precalculadas en el almacén de la app se copian tal cual
+    (use_store=False las reconstruye). se escribe en una carpeta
+    temporal que reemplaza a la anterior al final, así un servidor que
+    lee bundle_dir nunca ve un paquete a medias
+    """
+    start = time.perf_counter()
+    versions = app.data_versions()
+    data = load_data(versions)
+    store_dir = app.figure_store_dir()
+
+    tmp_dir = f'{bundle_dir.rstrip(os.sep)}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    figures, tables = [], []
+    from_store = 0
+    for key in figure_keys(data, versions, [resolution]):
+        name = bundle_entry(key)
+
+        stored_path = stored_figure_path(store_dir, key)
+        if use_store and os.path.exists(stored_path):
+            # el almacén ya guarda json con gzip: se copia sin descomprimir
+            path = bundle_file(tmp_dir, FIGURES_DIR, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(stored_path, path)
+            from_store += 1
+        else:
+            write_bundle_text(tmp_dir, FIGURES_DIR, name, figure_json(build_figure(key, data)))
+        figures.append(name)
+
+        df_table = build_table(key, data)
+        if df_table is not None:
+            write_bundle_text(tmp_dir, TABLES_DIR, name, table_json(df_table))
+            tables.append(name)
+
+    # tabla por tipo (todos los años) y, opcional, el mapa con todos los años
+    write_bundle_text(tmp_dir, TABLES_DIR, entry_name('type_table'),
+                      table_json(app.make_type_table(data['fossil_index']['totals'])))
+    tables.append(entry_name('type_table'))
+
+    if frames:
+        fig = app.load_co2_map_frames(app.CSV_PATH, app.SHP_PATH, resolution, versions[app.CSV_PATH])
+        write_bundle_text(tmp_dir, FIGURES_DIR, entry_name('map_frames'), figure_json(fig))
+        figures.append(entry_name('map_frames'))
+
+    years = [int(y) for y in data['cube']['years']]
+    ranges = sorted({key[2] for key in figure_keys(data, versions, []) if key[0] == 'line_global'})
+    manifest = {
+        'format': BUNDLE_FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'sources': {source_name(path): version for path, version in versions.items()},
+        'scale': app.DATA_SCALE,
+        'map': {'years': years, 'resolution': resolution},
+        'type_years': [int(y) for y in data['fossil_index']['years']],
+        'ranges': [list(r) for r in ranges],
+        'countries': {
+            'line': default_countries(data['cube']['countries']),
+            'regions': default_countries(data['cube']['countries']),
+        },
+        'figures': sorted(figures),
+        'tables': sorted(tables),
+    }
+    # el manifest se escribe al final: su presencia marca el paquete completo
+    write_json(manifest, os.path.join(tmp_dir, MANIFEST_FILE))
+
+    old_dir = f'{bundle_dir.rstrip(os.sep)}.{os.getpid()}.old'
+    if os.path.exists(bundle_dir):
+        os.replace(bundle_dir, old_dir)
+    os.replace(tmp_dir, bundle_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    manifest['seconds'] = round(time.perf_counter() - start, 3)
+    manifest['from_store'] = from_store
+
+    return manifest
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='exporta todas las figuras y tablas del dashboard a un paquete estático'
+    )
+    parser.add_argument('--output', default=EXPORT_DIR, help=f'carpeta del paquete (por defecto {EXPORT_DIR})')
+    parser.add_argument('--resolution', default=app.MAP_RESOLUTION_DEFAULT, choices=list(app.MAP_RESOLUTIONS),
+                        help='resolución del mapa')
+    parser.add_argument('--no-frames', action='store_true',
+                        help='no incluye el mapa con todos los años (animación en el navegador)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='reconstruye todas las figuras en lugar de copiar las ya precalculadas')
+    args = parser.parse_args()
+
+    manifest = export(args.output, args.resolution, not args.no_frames, not args.rebuild)
+
+    print(f'paquete: {args.output}')
+    print(f'figuras: {len(manifest["figures"]):,} ({manifest["from_store"]:,} del almacén precalculado)  '
+          f'tablas: {len(manifest["tables"]):,}')
+    print(f'tamaño: {directory_size(args.output) / 1e6:,.1f} MB en {manifest["seconds"]:.1f} s')
+    print(f'para servirlo desde la app: {BUNDLE_ENV_VAR}={args.output} streamlit run app.py')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+# ============================
+# caché de figuras serializadas
+# ============================
+# tope de la caché en memoria por proceso, en bytes de json: el mapa
+# ocupa 0.8–3.5 MB según la resolución, las líneas y barras unos pocos kB
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+# nivel de gzip de las figuras guardadas en disco (la geometría del mapa comprime ~10x)
+FIGURE_STORE_COMPRESSION = 5
+
+
+def stored_figure_path(store_dir: str, key: tuple) -> str:
+    """
+    archivo de una figura en el almacén en disco: hash de repr(key),
+    igual en todos los procesos (las claves solo llevan int, str y tuplas)
+    """
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:24]
+    return os.path.join(store_dir, f'{digest}.json.gz')
+
+
+def read_stored_figure(store_dir: str, key: tuple):
+    """
+    json de una figura guardada en disco, o None si no está
+    """
+    try:
+        with gzip.open(stored_figure_path(store_dir, key), 'rt', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_stored_figure(store_dir: str, key: tuple, fig_json: str):
+    """
+    guarda el json de una figura en disco (temporal + renombrado, así
+    varios procesos pueden escribir la misma clave)
+    """
+    path = stored_figure_path(store_dir, key)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    os.makedirs(store_dir, exist_ok=True)
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=FIGURE_STORE_COMPRESSION) as f:
+        f.write(fig_json)
+    os.replace(tmp_path, path)
+
+
+class FigureCache:
+    """
+    lru de figuras plotly ya serializadas a json, indexado por una clave
+    de parámetros (pestaña, año o rango, países ordenados) y acotado por
+    el total de bytes de json (una figura más grande que el tope no se
+    guarda en memoria).
+    guarda contadores de aciertos y fallos. es seguro entre hilos, así
+    que puede compartirse entre sesiones de streamlit.
+    con store_dir, detrás del lru hay un almacén en disco compartido
+    entre procesos (ver precompute.py): un fallo en memoria busca ahí
+    antes de construir, y lo construido se guarda ahí también
+    """
+
+    def __init__(self, max_bytes: int = FIGURE_CACHE_BYTES, store_dir: str = None):
+        self.max_bytes = max_bytes
+        self.store_dir = store_dir
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: tuple, build) -> str:
+        """
+        json de la figura para `key`; si no está, llama a build()
+        (que devuelve una go.Figure, o su json ya serializado), la
+        serializa y la guarda
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        fig_json = read_stored_figure(self.store_dir, key) if self.store_dir else None
+        from_disk = fig_json is not None
+        if not from_disk:
+            fig = build()
+            fig_json = fig if isinstance(fig, str) else pio.to_json(fig, validate=False)
+            if self.store_dir:
+                write_stored_figure(self.store_dir, key, fig_json)
+
+        with self._lock:
+            if from_disk:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            if key in self._items:
+                self.bytes -= len(self._items.pop(key))
+            if len(fig_json) <= self.max_bytes:
+                self._items[key] = fig_json
+                self.bytes += len(fig_json)
+            while self.bytes > self.max_bytes:
+                _, old_json = self._items.popitem(last=False)
+                self.bytes -= len(old_json)
+
+        return fig_json
+
+    def stats(self) -> dict:
+        """
+        contadores de la caché: aciertos, fallos, tasa de acierto, figuras
+        guardadas y bytes que ocupan
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'size': len(self._items),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
@@ -0,0 +1,311 @@
+import argparse
+import csv
+import glob
+import io
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from data_store import (
+    CATEGORICAL_COLUMNS,
+    PROCESSED_DIR,
+    RAW_DIR,
+    bump_data_version,
+    read_csv_cached,
+    store_cache,
+)
+
+# ============================
+# ingesta incremental de nuevas versiones de owid
+# ============================
+# una nueva publicación de owid se compara por (Entity, Year) con el csv
+# de data/raw: solo las filas nuevas o modificadas se escriben (con el
+# texto tal cual viene en la publicación; el resto del csv no se toca,
+# así el diff del archivo son solo esas líneas), la caché
+# columnar se actualiza sin volver a parsear el csv y la versión del csv
+# sube, para que las apps en marcha recarguen sus datos (ver app.data_versions).
+# owid trae una fila por (Entity, Year); si una clave se repite (p. ej.
+# pasos mensuales de synthetic_data.py), sus filas se emparejan por orden
+# de aparición (ver key_index)
+KEY_COLUMNS = ['Entity', 'Year']
+
+# filas de la publicación nueva por lote al compararla
+CHUNK_ROWS = 100_000
+
+
+def find_target(release_csv: str, raw_dir: str = RAW_DIR) -> str:
+    """
+    csv de data/raw con el mismo nombre de archivo que la publicación
+    """
+    name = os.path.basename(release_csv)
+    matches = glob.glob(os.path.join(raw_dir, '*', name))
+    if len(matches) != 1:
+        raise FileNotFoundError(f'no hay un único csv llamado {name} en {raw_dir} (usa --target)')
+
+    return matches[0]
+
+
+def plain_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    caché columnar con las categóricas como texto, para compararla y
+    combinarla con filas leídas del csv
+    """
+    return df.astype({col: 'object' for col in CATEGORICAL_COLUMNS if col in df.columns})
+
+
+def key_counts(df: pd.DataFrame) -> pd.Series:
+    """
+    filas por (Entity, Year)
+    """
+    return df[KEY_COLUMNS].astype({'Year': 'int64'}).value_counts()
+
+
+def key_index(df: pd.DataFrame, seen: pd.Series = None) -> pd.MultiIndex:
+    """
+    clave única de cada fila: (Entity, Year, n), con n el número de
+    aparición de (Entity, Year) hasta esa fila (0 si la clave no se
+    repite). seen: filas por clave en lotes anteriores del mismo archivo
+    (ver key_counts)
+    """
+    keys = df[KEY_COLUMNS].astype({'Year': 'int64'})
+    n = keys.groupby(KEY_COLUMNS, sort=False).cumcount().to_numpy()
+    if seen is not None and not seen.empty:
+        n = n + seen.reindex(pd.MultiIndex.from_frame(keys)).fillna(0).to_numpy(dtype='int64')
+
+    return pd.MultiIndex.from_arrays(
+        [keys['Entity'].to_numpy(), keys['Year'].to_numpy(), n],
+        names=KEY_COLUMNS + ['n']
+    )
+
+
+def same_values(old: pd.Series, new: pd.Series) -> np.ndarray:
+    """
+    compara dos columnas fila a fila; dos faltantes cuentan como iguales
+    """
+    both_missing = old.isna().to_numpy() & new.isna().to_numpy()
+    if pd.api.types.is_numeric_dtype(old.dtype) and pd.api.types.is_numeric_dtype(new.dtype):
+        equal = old.to_numpy(dtype='float64') == new.to_numpy(dtype='float64')
+    else:
+        equal = old.astype(object).to_numpy() == new.astype(object).to_numpy()
+
+    return equal | both_missing
+
+
+def diff_release(current: pd.DataFrame, release_csv: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    lee la publicación nueva por lotes y devuelve las filas que agrega
+    (clave ausente en current) y las que modifica (clave presente con
+    algún valor distinto), más la posición en current de estas últimas.
+    el índice de las filas devueltas es su número de fila en la
+    publicación sin contar las líneas en blanco, como las numera pandas
+    (ver release_lines). solo se retienen en memoria las filas que cambian
+    """
+    keys = key_index(current)
+    seen = None
+    added, updated, positions = [], [], []
+
+    for chunk in pd.read_csv(release_csv, chunksize=chunk_rows):
+        if set(chunk.columns) != set(current.columns):
+            raise ValueError(
+                f'las columnas de la publicación no coinciden con el csv actual: '
+                f'{sorted(set(chunk.columns) ^ set(current.columns))}'
+            )
+        chunk = chunk[list(current.columns)]
+
+        pos = keys.get_indexer(key_index(chunk, seen))
+        counts = key_counts(chunk)
+        seen = counts if seen is None else seen.add(counts, fill_value=0)
+        added.append(chunk[pos < 0])
+
+        present = chunk[pos >= 0]
+        old = current.iloc[pos[pos >= 0]]
+        changed = np.zeros(len(present), dtype=bool)
+        for col in current.columns:
+            changed |= ~same_values(old[col], present[col])
+        updated.append(present[changed])
+        positions.append(pos[pos >= 0][changed])
+
+    empty = current.iloc[:0]
+    return (
+        pd.concat([empty] + added),
+        pd.concat([empty] + updated),
+        np.concatenate(positions) if positions else np.array([], dtype='int64'),
+    )
+
+
+def upsert_rows(current: pd.DataFrame, positions: np.ndarray, rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    reemplaza en su lugar las filas de current en `positions` por `rows`
+    (las columnas enteras pasan a float si las filas nuevas traen faltantes)
+    """
+    columns = {}
+    for col in current.columns:
+        values = current[col].to_numpy(copy=True)
+        new = rows[col].to_numpy()
+        if values.dtype.kind in 'iu' and new.dtype.kind not in 'iu':
+            values = values.astype('float64')
+        elif values.dtype.kind in 'iuf' and new.dtype.kind not in 'iuf':
+            values = values.astype(object)
+        values[positions] = new
+        columns[col] = values
+
+    return pd.DataFrame(columns)
+
+
+def csv_line(fields: list) -> str:
+    out = io.StringIO()
+    csv.writer(out, lineterminator='\n').writerow(fields)
+    return out.getvalue()
+
+
+def release_lines(release_csv: str, rows, header: list) -> dict:
+    """
+    texto de las filas `rows` (número de fila de datos) de la publicación,
+    {fila: línea}, con los valores tal cual están escritos en ella (sin
+    pasar por pandas, que reescribe p. ej. 14656 como 14656.0) y las
+    columnas en el orden de `header`. las líneas en blanco no cuentan
+    como fila, igual que en pd.read_csv
+    """
+    wanted = set(int(r) for r in rows)
+    lines = {}
+    with open(release_csv, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        order = [columns.index(col) for col in header]
+        i = 0
+        for fields in reader:
+            if len(fields) <= 1 and not ''.join(fields).strip():
+                continue
+            if i in wanted:
+                lines[i] = csv_line([fields[j] for j in order])
+            i += 1
+
+    return lines
+
+
+def write_rows(target_csv: str,
+               n_rows: int,
+               positions: np.ndarray,
+               updated: pd.DataFrame,
+               added: pd.DataFrame,
+               release_csv: str):
+    """
+    escribe en el csv de data/raw (n_rows filas) las filas modificadas
+    (reemplaza la línea de la fila positions[i]) y las nuevas (al final),
+    copiando el resto de las líneas sin cambios. las líneas en blanco se
+    copian y no cuentan como fila (como en pd.read_csv). con solo altas
+    es un append
+    """
+    with open(target_csv, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+    lines = release_lines(release_csv, np.concatenate([updated.index, added.index]), header)
+    appended = ''.join(lines[i] for i in added.index)
+
+    if updated.empty:
+        with open(target_csv, 'rb+') as f:
+            # el csv puede no terminar en salto de línea
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    appended = '\n' + appended
+        with open(target_csv, 'a', newline='', encoding='utf-8') as f:
+            f.write(appended)
+        return
+
+    replaced = {int(pos): lines[i] for pos, i in zip(positions, updated.index)}
+    tmp_path = f'{target_csv}.{os.getpid()}.tmp'
+    rows = 0        # filas de datos ya copiadas (sin la cabecera)
+    with open(target_csv, newline='', encoding='utf-8') as src, \
+            open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+        for n, line in enumerate(src):
+            if n > 0 and line.strip():
+                if rows in replaced:
+                    # conserva el fin de línea del archivo (\n o \r\n)
+                    ending = line[len(line.rstrip('\r\n')):] or '\n'
+                    line = replaced[rows][:-1] + ending
+                rows += 1
+            if not line.endswith('\n'):
+                line += '\n'
+            dst.write(line)
+        dst.write(appended)
+
+    # una línea por fila (los valores de owid no llevan saltos de línea);
+    # si no, las posiciones no corresponden a las líneas
+    if rows != n_rows:
+        os.remove(tmp_path)
+        raise ValueError(f'{target_csv}: tiene {rows:,} líneas de datos y {n_rows:,} filas')
+    os.replace(tmp_path, target_csv)
+
+
+def ingest(release_csv: str,
+           target_csv: str,
+           processed_dir: str = PROCESSED_DIR,
+           chunk_rows: int = CHUNK_ROWS,
+           dry_run: bool = False) -> dict:
+    """
+    incorpora una publicación nueva de owid al csv de data/raw:
+    - solo filas nuevas: se agregan al final del csv
+    - filas modificadas: se reemplaza su línea; el resto se copia igual
+    las filas que ya no están en la publicación se conservan. la caché
+    columnar se guarda desde memoria (sin parsear de nuevo el csv) y la
+    versión del csv sube en DATA_VERSION_FILE. devuelve el resumen
+    """
+    current = plain_frame(read_csv_cached(target_csv, processed_dir))
+    added, updated, positions = diff_release(current, release_csv, chunk_rows)
+
+    years = sorted(set(added['Year'].astype(int)) | set(updated['Year'].astype(int)))
+    changes = {
+        'rows_added': len(added),
+        'rows_updated': len(updated),
+        'years': years,
+        'source': os.path.abspath(release_csv),
+        'ingested_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+    if dry_run or (added.empty and updated.empty):
+        return {**changes, 'version': None}
+
+    write_rows(target_csv, len(current), positions, updated, added, release_csv)
+    if updated.empty:
+        merged = pd.concat([current, added], ignore_index=True)
+    else:
+        merged = pd.concat([upsert_rows(current, positions, updated), added], ignore_index=True)
+
+    store_cache(target_csv, merged, processed_dir)
+    version = bump_data_version(target_csv, changes, processed_dir)
+
+    return {**changes, 'version': version}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='incorpora una publicación nueva de owid escribiendo solo las filas nuevas o modificadas'
+    )
+    parser.add_argument('release', help='csv de la publicación nueva (mismo esquema que el de data/raw)')
+    parser.add_argument('--target', help='csv de data/raw a actualizar (por defecto, el de mismo nombre)')
+    parser.add_argument('--processed-dir', default=PROCESSED_DIR,
+                        help='carpeta de cachés de la app (la de un conjunto sintético en modo escala)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='filas por lote al comparar')
+    parser.add_argument('--dry-run', action='store_true', help='solo informa los cambios, sin escribir')
+    args = parser.parse_args()
+
+    target = args.target or find_target(args.release)
+    result = ingest(args.release, target, args.processed_dir, args.chunk_rows, args.dry_run)
+
+    print(f'destino: {target}')
+    print(f'filas nuevas: {result["rows_added"]:,}  modificadas: {result["rows_updated"]:,}')
+    if result['years']:
+        print(f'años afectados: {result["years"][0]}–{result["years"][-1]} ({len(result["years"])})')
+    if result['version'] is not None:
+        print(f'versión de datos: {result["version"]}')
+    elif result['rows_added'] or result['rows_updated']:
+        print('sin escribir (--dry-run)')
+    else:
+        print('sin cambios')
+
+
+if __name__ == '__main__':
+    main()
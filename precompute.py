@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import plotly.io as pio
+
+import app
+from data_store import write_json
+from figure_cache import read_stored_figure, stored_figure_path, write_stored_figure
+
+# ============================
+# precálculo de figuras en paralelo
+# ============================
+# construye con un pool de procesos las figuras que más se piden y las
+# guarda en el almacén en disco de la caché de figuras (ver
+# app.figure_store_dir), del que leen todos los procesos de la app.
+# se corre a mano (`python precompute.py`) o, con CO2_PRECOMPUTE=1, la
+# app lo lanza en segundo plano al arrancar (ver app.start_warmup); el
+# avance se ve en el sidebar
+STATUS_FILE = 'precompute_status.json'
+LOCK_FILE = 'precompute.lock'
+
+# inicios de los rangos de años precalculados para las líneas y el área
+# (todos hasta el último año), además del rango completo
+PRECOMPUTE_RANGE_STARTS = [1850, 1900, 1950, 1990, 2000]
+
+# cada cuántas figuras terminadas se reescribe el estado
+STATUS_EVERY = 10
+
+# datos de cada proceso del pool (ver init_worker)
+_data = {}
+
+
+def available_cores() -> int:
+    """
+    núcleos que puede usar este proceso (respeta la afinidad de cpu)
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def read_status(store_dir: str) -> dict:
+    """
+    avance del último precálculo en store_dir ({} si nunca corrió):
+    total, done, errors, workers, pid, started_at, finished_at
+    """
+    try:
+        with open(os.path.join(store_dir, STATUS_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def pid_alive(pid: int) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def acquire_lock(store_dir: str) -> bool:
+    """
+    un solo precálculo por almacén: crea el lock con el pid propio, o
+    lo toma si el proceso que lo creó ya no existe
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, LOCK_FILE)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    owner = int(f.read().strip() or 0)
+            except (FileNotFoundError, ValueError):
+                owner = 0
+            if pid_alive(owner):
+                return False
+            # lock huérfano: se borra y se reintenta
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(str(os.getpid()))
+        return True
+
+    return False
+
+
+def release_lock(store_dir: str):
+    try:
+        os.remove(os.path.join(store_dir, LOCK_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def default_countries(available) -> list:
+    """
+    países preseleccionados al activar el filtro, igual que en las pestañas
+    """
+    available = sorted(str(c) for c in available)
+    return [c for c in app.DEFAULT_COUNTRIES if c in available] or available[:5]
+
+
+def figure_keys(data: dict, versions: dict, resolutions: list) -> list:
+    """
+    claves de la caché de figuras a precalcular, con el mismo formato que
+    usan las pestañas: el mapa y las barras por tipo de cada año, y las
+    líneas y el área para los rangos de PRECOMPUTE_RANGE_STARTS (con y
+    sin los países preseleccionados)
+    """
+    data_version = versions[app.CSV_PATH]
+    fossil_version = versions[app.CSV_FOSSIL_PATH]
+    cube = data['cube']
+    years = [int(y) for y in cube['years']]
+
+    keys = [('map', data_version, year, resolution) for resolution in resolutions for year in years]
+    keys += [('type_bar', fossil_version, int(y)) for y in data['fossil_index']['years']]
+
+    first, last = years[0], years[-1]
+    starts = [first] + [y for y in PRECOMPUTE_RANGE_STARTS if first < y < last]
+    countries = tuple(sorted(default_countries(cube['countries'])))
+    for start in starts:
+        year_range = (start, last)
+        keys += [
+            ('line_global', data_version, year_range),
+            ('line_countries', data_version, year_range, countries),
+            ('area', data_version, year_range, None),
+            ('area', data_version, year_range, countries),
+        ]
+
+    return keys
+
+
+def build_figure(key: tuple, data: dict):
+    """
+    figura de una clave de figure_keys (go.Figure, o el json del mapa),
+    con las mismas consultas y funciones de figura que las pestañas
+    """
+    kind = key[0]
+
+    if kind == 'map':
+        _, _, year, resolution = key
+        return app.make_co2_map_json(data['map_assets'], app.load_world_geojson_text(app.SHP_PATH, resolution), year)
+
+    if kind == 'type_bar':
+        _, _, year = key
+        return app.make_type_bar(app.query_type_totals(data['fossil_index'], year), year)
+
+    if kind == 'line_global':
+        _, _, year_range = key
+        return app.make_global_line(app.query_global_by_year(data['cube'], year_range), year_range)
+
+    if kind == 'line_countries':
+        _, _, year_range, countries = key
+        df = app.query_countries_by_year(data['cube'], list(countries), year_range)
+        return app.make_countries_line(df, year_range)
+
+    if kind == 'area':
+        _, _, year_range, countries = key
+        df_pivot, _, title_suffix = app.query_regional(
+            data['cube'], year_range, list(countries) if countries else None
+        )
+        return app.make_regions_area(df_pivot, title_suffix)
+
+    raise ValueError(f'clave de figura desconocida: {key}')
+
+
+def load_data(versions: dict) -> dict:
+    """
+    datos que usan las figuras precalculadas (ver app.DATASETS)
+    """
+    names = ['cube', 'fossil_index', 'map_assets']
+    return {name: app.DATASETS[name](versions) for name in names}
+
+
+def init_worker(versions: dict):
+    # cada proceso abre los datos una vez: las tablas son memory map de
+    # data/processed, ya generadas por el proceso principal
+    _data.update(load_data(versions))
+
+
+def build_and_store(store_dir: str, key: tuple, force: bool = False) -> tuple:
+    if force or read_stored_figure(store_dir, key) is None:
+        fig = build_figure(key, _data)
+        write_stored_figure(store_dir, key, fig if isinstance(fig, str) else pio.to_json(fig, validate=False))
+    return key
+
+
+def run(workers: int = None, resolutions: list = None, force: bool = False) -> dict:
+    """
+    precalcula las figuras de figure_keys en un pool de `workers`
+    procesos (por defecto, uno por núcleo) y escribe el avance en
+    STATUS_FILE. si ya hay otro precálculo corriendo sobre el mismo
+    almacén, no hace nada y devuelve su estado
+    """
+    store_dir = app.figure_store_dir()
+    if not acquire_lock(store_dir):
+        return read_status(store_dir)
+
+    try:
+        app.prune_figure_stores(store_dir)
+
+        # el proceso principal genera las cachés de data/processed antes de abrir el pool
+        versions = app.data_versions()
+        data = load_data(versions)
+        for resolution in resolutions or [app.MAP_RESOLUTION_DEFAULT]:
+            app.load_world_geojson_text(app.SHP_PATH, resolution)
+
+        all_keys = figure_keys(data, versions, resolutions or [app.MAP_RESOLUTION_DEFAULT])
+        keys = all_keys
+        if not force:
+            keys = [key for key in all_keys if not os.path.exists(stored_figure_path(store_dir, key))]
+
+        workers = workers or available_cores()
+        status = {
+            'total': len(all_keys),
+            'done': len(all_keys) - len(keys),
+            'built': len(keys),
+            'errors': 0,
+            'workers': workers,
+            'pid': os.getpid(),
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'finished_at': None,
+        }
+        status_path = os.path.join(store_dir, STATUS_FILE)
+        write_json(status, status_path)
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(versions,)) as pool:
+            futures = [pool.submit(build_and_store, store_dir, key, force) for key in keys]
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    status['errors'] += 1
+                status['done'] += 1
+                if status['done'] % STATUS_EVERY == 0:
+                    write_json(status, status_path)
+
+        status['finished_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        status['seconds'] = round(time.perf_counter() - start, 3)
+        write_json(status, status_path)
+
+        return status
+    finally:
+        release_lock(store_dir)
+
+
+def start_background(workers: int) -> bool:
+    """
+    lanza este módulo como proceso aparte (sin fork del servidor de
+    streamlit) si el almacén actual no está completo ni en curso.
+    el proceso hereda las variables de entorno (modo escala, motor)
+    """
+    store_dir = app.figure_store_dir()
+    status = read_status(store_dir)
+    if status.get('finished_at') and not status.get('errors'):
+        return False
+    if pid_alive(status.get('pid')) and not status.get('finished_at'):
+        return False
+
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--workers', str(workers)],
+        cwd=app.BASE_DIR,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='precalcula en paralelo las figuras del mapa por año y de los rangos comunes'
+    )
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f'procesos del pool (por defecto {available_cores()}, uno por núcleo)')
+    parser.add_argument('--resolution', action='append', choices=list(app.MAP_RESOLUTIONS),
+                        help='resolución del mapa (repetible; por defecto la de la app)')
+    parser.add_argument('--force', action='store_true', help='reconstruye aunque la figura ya esté en disco')
+    args = parser.parse_args()
+
+    status = run(args.workers, args.resolution, args.force)
+    if not status.get('finished_at'):
+        print(f'ya hay un precálculo en curso (pid {status.get("pid")}): {status.get("done", 0)}/{status.get("total", 0)}')
+        return
+
+    print(f'figuras en disco: {status["done"] - status["errors"]} de {status["total"]}; '
+          f'{status["built"]} construidas en {status["seconds"]:.1f} s con {status["workers"]} procesos '
+          f'({status["errors"]} errores)')
+    print(f'almacén: {app.figure_store_dir()}')
+
+
+if __name__ == '__main__':
+    main()
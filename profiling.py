@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ============================
+# instrumentación por ejecución (rerun)
+# ============================
+# se activa con la variable de entorno CO2_PROFILE=1 o con ?profile=1 en la url
+PROFILE_ENV_VAR = 'CO2_PROFILE'
+PROFILE_QUERY_PARAM = 'profile'
+
+# etapas de un rerun, en el orden en que se muestran
+STAGE_LOAD = 'carga de datos'
+STAGE_FILTER = 'filtrado'
+STAGE_AGGREGATE = 'agregación'
+STAGE_FIGURE_BUILD = 'construcción de figura'
+STAGE_FIGURE_SERIALIZE = 'serialización de figura'
+STAGE_FIGURE_SEND = 'envío de figura a streamlit'
+STAGE_TABLE_BUILD = 'construcción de tabla'
+STAGE_TABLE_SEND = 'envío de tabla a streamlit'
+
+# alcance de una ejecución: todo el script o solo el fragmento de la pestaña
+SCOPE_APP = 'app'
+SCOPE_FRAGMENT = 'fragmento'
+
+logger = logging.getLogger('co2_app.profile')
+
+
+def configure_logging():
+    """
+    envía los logs de perfil a stderr (una línea json por rerun);
+    streamlit no configura handlers para loggers ajenos
+    """
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def is_enabled(query_value: str = None) -> bool:
+    """
+    indica si hay que perfilar: por variable de entorno o parámetro de la url
+    """
+    values = [os.environ.get(PROFILE_ENV_VAR, ''), query_value or '']
+    return any(v.strip().lower() in ('1', 'true', 'yes', 'si', 'sí') for v in values)
+
+
+class RerunProfiler:
+    """
+    registra la duración de cada etapa de un rerun. si está desactivado,
+    stage() no mide nada y el costo es el de un context manager vacío
+    """
+
+    def __init__(self, tab: str, enabled: bool = True, scope: str = SCOPE_APP):
+        self.tab = tab
+        self.enabled = enabled
+        self.scope = scope
+        self.stages = []
+        self._start = time.perf_counter()
+        self._emitted = False
+
+    def for_fragment(self) -> 'RerunProfiler':
+        """
+        perfilador para el cuerpo de un fragmento (st.fragment): este mismo
+        si el fragmento corre dentro de un rerun completo, o uno nuevo si
+        se ejecuta solo (recibe los argumentos del último rerun completo,
+        cuyo perfilador ya se emitió)
+        """
+        if not self._emitted:
+            return self
+        return RerunProfiler(self.tab, self.enabled, scope=SCOPE_FRAGMENT)
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                'stage': name,
+                'ms': 1000 * (time.perf_counter() - start),
+                **labels,
+            })
+
+    def record(self, name: str, seconds: float, **labels):
+        """
+        agrega una etapa medida por fuera (p. ej. la serialización, que
+        ocurre dentro de la caché de figuras)
+        """
+        if self.enabled:
+            self.stages.append({'stage': name, 'ms': 1000 * seconds, **labels})
+
+    def total_ms(self) -> float:
+        return 1000 * (time.perf_counter() - self._start)
+
+    def emit(self, metrics: 'StageMetrics' = None):
+        """
+        cierra el rerun: escribe una línea de log json y suma las etapas
+        a los contadores del proceso
+        """
+        self._emitted = True
+        if not self.enabled:
+            return
+
+        logger.info(json.dumps({
+            'event': 'rerun',
+            'tab': self.tab,
+            'scope': self.scope,
+            'total_ms': round(self.total_ms(), 3),
+            'stages': [{**s, 'ms': round(s['ms'], 3)} for s in self.stages],
+        }, ensure_ascii=False))
+
+        if metrics is not None:
+            metrics.observe(self)
+
+
+# perfilador desactivado, usado como valor por defecto en las consultas
+NULL_PROFILER = RerunProfiler('', enabled=False)
+
+
+class StageMetrics:
+    """
+    contadores acumulados por (pestaña, etapa) para todo el proceso,
+    exportables en formato openmetrics: tiempos y, en las etapas de
+    envío, bytes enviados y ahorrados por la compactación. seguro entre hilos
+    """
+
+    def __init__(self):
+        self.reruns = {}
+        self.stages = {}
+        self.payload = {}
+        self._lock = threading.Lock()
+
+    def observe(self, profiler: RerunProfiler):
+        with self._lock:
+            self.reruns[profiler.tab] = self.reruns.get(profiler.tab, 0) + 1
+            for s in profiler.stages:
+                key = (profiler.tab, s['stage'])
+                count, total = self.stages.get(key, (0, 0.0))
+                self.stages[key] = (count + 1, total + s['ms'] / 1000)
+                if 'bytes' in s:
+                    sent, saved = self.payload.get(key, (0, 0))
+                    self.payload[key] = (sent + s['bytes'], saved + s.get('bytes_saved', 0))
+
+    def to_openmetrics(self) -> str:
+        def label(value: str) -> str:
+            return value.replace('\\', '\\\\').replace('"', '\\"')
+
+        with self._lock:
+            lines = [
+                '# TYPE co2_app_reruns counter',
+                '# HELP co2_app_reruns reruns perfilados por pestaña',
+            ]
+            for tab, count in sorted(self.reruns.items()):
+                lines.append(f'co2_app_reruns_total{{tab="{label(tab)}"}} {count}')
+
+            lines += [
+                '# TYPE co2_app_stage_seconds summary',
+                '# HELP co2_app_stage_seconds tiempo por etapa del rerun',
+            ]
+            for (tab, stage), (count, total) in sorted(self.stages.items()):
+                labels = f'tab="{label(tab)}",stage="{label(stage)}"'
+                lines.append(f'co2_app_stage_seconds_count{{{labels}}} {count}')
+                lines.append(f'co2_app_stage_seconds_sum{{{labels}}} {total:.6f}')
+
+            lines += [
+                '# TYPE co2_app_payload_bytes counter',
+                '# HELP co2_app_payload_bytes bytes enviados al navegador por pestaña y etapa',
+            ]
+            for (tab, stage), (sent, _) in sorted(self.payload.items()):
+                lines.append(f'co2_app_payload_bytes_total{{tab="{label(tab)}",stage="{label(stage)}"}} {sent}')
+
+            lines += [
+                '# TYPE co2_app_payload_saved_bytes counter',
+                '# HELP co2_app_payload_saved_bytes bytes ahorrados por la compactación (ver transport.py)',
+            ]
+            for (tab, stage), (_, saved) in sorted(self.payload.items()):
+                lines.append(f'co2_app_payload_saved_bytes_total{{tab="{label(tab)}",stage="{label(stage)}"}} {saved}')
+
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,218 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+# ============================
+# motor de consultas fuera de memoria (duckdb)
+# ============================
+# se elige con CO2_QUERY_ENGINE=duckdb; sin duckdb instalado, o con
+# CO2_QUERY_ENGINE=pandas (por defecto), la app usa sus consultas pandas
+ENGINE_ENV_VAR = 'CO2_QUERY_ENGINE'
+ENGINE_PANDAS = 'pandas'
+ENGINE_DUCKDB = 'duckdb'
+
+
+def resolve_engine(name: str = None) -> str:
+    """
+    motor a usar según el nombre pedido (o la variable de entorno);
+    cae a pandas si el motor no existe o su dependencia no está instalada
+    """
+    name = (name or os.environ.get(ENGINE_ENV_VAR) or ENGINE_PANDAS).strip().lower()
+    # find_spec no importa duckdb: el import se hace al crear el motor
+    if name == ENGINE_DUCKDB and importlib.util.find_spec('duckdb') is not None:
+        return ENGINE_DUCKDB
+    return ENGINE_PANDAS
+
+
+def _value(column: str) -> str:
+    """
+    expresión sql de una columna de emisiones con los nan como null,
+    para que sum() los salte igual que pandas
+    """
+    return f'CASE WHEN isnan(CAST({column} AS DOUBLE)) THEN NULL ELSE {column} END'
+
+
+class DuckDBEngine:
+    """
+    consultas de cada pestaña sobre las tablas derivadas en feather
+    (emisiones y emisiones por tipo), escaneadas con pyarrow.dataset:
+    duckdb empuja los filtros de año / país y lee solo las columnas
+    que usa, así que solo se materializan las filas del resultado.
+    los resultados tienen las mismas columnas, tipos y orden que las
+    consultas pandas de la app
+    """
+
+    def __init__(self,
+                 emissions_path: str,
+                 fossil_path: str,
+                 fossil_columns: list,
+                 country_kind: str = 'country',
+                 world_kind: str = 'world'):
+        import duckdb
+
+        self.emissions_path = emissions_path
+        self.fossil_path = fossil_path
+        self.fossil_columns = list(fossil_columns)
+        self.country_kind = country_kind
+        self.world_kind = world_kind
+        self._con = duckdb.connect()
+
+        # tipos pandas de las columnas de salida, tal como las lee read_frame
+        schema = feather.read_table(emissions_path, memory_map=True).slice(0, 0).to_pandas()
+        self._country_dtype = schema['country'].dtype
+        self._co2_dtype = schema['co2'].dtype
+
+    def _query(self, sql: str, params: list = None) -> pd.DataFrame:
+        import pyarrow.dataset as ds
+
+        # un cursor por consulta: los objetos registrados son locales al
+        # cursor y así las sesiones de streamlit no comparten estado
+        cursor = self._con.cursor()
+        try:
+            cursor.register('emissions', ds.dataset(self.emissions_path, format='feather'))
+            cursor.register('fossil', ds.dataset(self.fossil_path, format='feather'))
+            return cursor.execute(sql, params or []).df()
+        finally:
+            cursor.close()
+
+    def _co2_sum(self) -> str:
+        # suma compensada (kahan) para floats, como groupby().sum() de pandas
+        if pd.api.types.is_float_dtype(self._co2_dtype):
+            return f"coalesce(fsum({_value('co2')}), 0)::DOUBLE"
+        return f"coalesce(sum({_value('co2')}), 0)::BIGINT"
+
+    def year_slice(self, year: int) -> pd.DataFrame:
+        """
+        emisiones de un año (country, code, co2), ordenadas por iso3,
+        solo países con dato
+        """
+        df = self._query(
+            f"""
+            SELECT any_value(country) AS country, code, sum(CAST(co2 AS DOUBLE)) AS co2
+            FROM emissions
+            WHERE year = ?
+            GROUP BY code
+            HAVING NOT isnan(sum(CAST(co2 AS DOUBLE)))
+            ORDER BY code
+            """,
+            [int(year)]
+        )
+        return df
+
+    def countries_by_year(self, countries: list, year_range: tuple) -> pd.DataFrame:
+        """
+        emisiones por año y país (year, country, co2) de los países dados
+        """
+        df = self._query(
+            f"""
+            SELECT year, country, {self._co2_sum()} AS co2
+            FROM emissions
+            WHERE year BETWEEN ? AND ? AND list_contains(?, country)
+            GROUP BY year, country
+            ORDER BY year, country
+            """,
+            [int(year_range[0]), int(year_range[1]), list(countries)]
+        )
+        df['country'] = df['country'].astype(self._country_dtype)
+        return df
+
+    def global_by_year(self, year_range: tuple) -> pd.DataFrame:
+        """
+        emisiones de todos los países por año (year, co2_total)
+        """
+        return self._query(
+            f"""
+            SELECT year, {self._co2_sum()} AS co2_total
+            FROM emissions
+            WHERE year BETWEEN ? AND ?
+            GROUP BY year
+            ORDER BY year
+            """,
+            [int(year_range[0]), int(year_range[1])]
+        )
+
+    def type_cumulative(self, year: int) -> dict:
+        """
+        emisiones por tipo acumuladas hasta `year` inclusive, {tipo: toneladas}.
+        cada año usa la fila World de owid y, donde no tiene dato, la suma
+        de los países; los demás agregados de owid no se suman
+        """
+        by_year = ',\n'.join(
+            f"""coalesce(
+                max({_value(col)}) FILTER (WHERE kind = '{self.world_kind}'),
+                sum({_value(col)}) FILTER (WHERE kind = '{self.country_kind}'),
+                0
+            ) AS {col}"""
+            for col in self.fossil_columns
+        )
+        df = self._query(
+            f"""
+            WITH by_year AS (
+                SELECT year, {by_year}
+                FROM fossil
+                WHERE year <= ?
+                GROUP BY year
+            )
+            SELECT {', '.join(f'coalesce(sum({col}), 0) AS {col}' for col in self.fossil_columns)}
+            FROM by_year
+            """,
+            [int(year)]
+        )
+        return {col: float(df[col].iloc[0]) for col in self.fossil_columns}
+
+    def top_countries(self, year_range: tuple, n: int) -> list:
+        """
+        los n países con más emisiones acumuladas en year_range
+        (con algún registro en el rango); empates por iso3
+        """
+        df = self._query(
+            f"""
+            SELECT any_value(country) AS country
+            FROM emissions
+            WHERE year BETWEEN ? AND ?
+            GROUP BY code
+            ORDER BY coalesce(sum({_value('co2')}), 0) DESC, code
+            LIMIT ?
+            """,
+            [int(year_range[0]), int(year_range[1]), int(n)]
+        )
+        return df['country'].tolist()
+
+    def regional_rows(self, year_range: tuple, countries: list) -> pd.DataFrame:
+        """
+        emisiones y participación en el total del año (year, country, co2,
+        percentage) de los países dados, en el orden de `countries`.
+        el total del año suma todos los países, no solo los pedidos
+        """
+        df = self._query(
+            f"""
+            WITH selected AS (
+                SELECT unnest(?) AS country, generate_subscripts(?, 1) AS position
+            ),
+            year_totals AS (
+                SELECT year, coalesce(sum({_value('co2')}), 0) AS total
+                FROM emissions
+                WHERE year BETWEEN ? AND ?
+                GROUP BY year
+            ),
+            cells AS (
+                SELECT e.year, e.country, s.position, sum(CAST(e.co2 AS DOUBLE)) AS co2
+                FROM emissions e
+                JOIN selected s ON e.country = s.country
+                WHERE e.year BETWEEN ? AND ?
+                GROUP BY e.year, e.country, s.position
+            )
+            SELECT c.year, c.country, c.co2,
+                   c.co2 / CASE WHEN t.total > 0 THEN t.total ELSE 1 END * 100 AS percentage
+            FROM cells c
+            JOIN year_totals t USING (year)
+            WHERE NOT isnan(c.co2)
+            ORDER BY c.year, c.position
+            """,
+            [list(countries), list(countries),
+             int(year_range[0]), int(year_range[1]),
+             int(year_range[0]), int(year_range[1])]
+        )
+        return df
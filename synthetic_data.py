@@ -0,0 +1,261 @@
+import argparse
+import glob
+import itertools
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+from data_store import BASE_DIR, RAW_DIR
+
+# ============================
+# datos sintéticos a escala (mismo esquema que los csv de owid)
+# ============================
+SYNTHETIC_DIR = os.path.join(BASE_DIR, 'data', 'synthetic')
+SCALE_ENV_VAR = 'CO2_SCALE'
+
+EMISSIONS_FILE = 'annual-co2-emissions-per-country.csv'
+FOSSIL_FILE = 'co2-fossil-plus-land-use.csv'
+CODES_FILE = 'country-codes.txt'
+
+COL_FOSSIL = 'Annual CO₂ emissions'
+COL_LAND_USE = 'Annual CO₂ emissions from land-use change'
+COL_TOTAL = 'Annual CO₂ emissions including land-use change'
+
+# entidades por lote al escribir (acota la memoria del generador)
+BATCH_ENTITIES = 500
+
+
+def synthetic_paths(name: str) -> dict:
+    """
+    rutas de un conjunto sintético: los dos csv, la lista de códigos de
+    país y su caché procesada (separada de data/processed para no pisar
+    la de los datos reales)
+    """
+    base = os.path.join(SYNTHETIC_DIR, name)
+    return {
+        'dir': base,
+        'csv': os.path.join(base, EMISSIONS_FILE),
+        'csv_fossil': os.path.join(base, FOSSIL_FILE),
+        'codes': os.path.join(base, CODES_FILE),
+        'processed': os.path.join(base, 'processed'),
+    }
+
+
+def synthetic_codes(n: int, reserved: set) -> list:
+    """
+    n códigos de 3 letras que no chocan con los iso3 reales. no están en
+    natural earth: generate los lista en CODES_FILE para que la app los
+    trate como países (sin geometría en el mapa)
+    """
+    codes = []
+    for letters in itertools.product(string.ascii_uppercase, repeat=3):
+        code = ''.join(letters)
+        if code not in reserved:
+            codes.append(code)
+            if len(codes) == n:
+                return codes
+
+    raise ValueError(f'no hay {n} códigos de 3 letras libres (máximo {len(codes)})')
+
+
+def entity_series(rng: np.random.Generator, n: int, years: np.ndarray):
+    """
+    series anuales (entidad, año) de emisiones fósiles y por cambio de
+    uso de suelo: curvas logísticas y campanas con ruido, en toneladas
+    """
+    t = years[np.newaxis, :].astype('float64')
+
+    # fósiles: crecimiento logístico con inicio, escala y pendiente por entidad
+    scale = 10 ** rng.uniform(4, 9.5, size=(n, 1))
+    midpoint = rng.uniform(years[0] + 0.5 * len(years), years[-1], size=(n, 1))
+    width = rng.uniform(8, 40, size=(n, 1))
+    fossil = scale / (1 + np.exp(-(t - midpoint) / width))
+
+    # cambio de uso de suelo: una campana por entidad
+    peak = rng.uniform(years[0], years[-1], size=(n, 1))
+    spread = rng.uniform(20, 80, size=(n, 1))
+    land_use = 0.3 * scale * np.exp(-((t - peak) / spread) ** 2)
+
+    noise = rng.lognormal(0, 0.05, size=(2, n, len(years)))
+    fossil = np.round(fossil * noise[0])
+    land_use = np.round(land_use * noise[1])
+
+    # cada entidad empieza a reportar en un año distinto
+    first = rng.integers(0, max(1, len(years) // 2), size=(n, 1))
+    has_data = np.arange(len(years))[np.newaxis, :] >= first
+
+    return fossil.astype('int64'), land_use.astype('int64'), has_data
+
+
+def split_steps(rng: np.random.Generator, values: np.ndarray, steps: int) -> np.ndarray:
+    """
+    reparte cada valor anual en `steps` partes enteras que suman el total
+    (columnas nuevas al final: (..., steps))
+    """
+    weights = rng.random(values.shape + (steps,))
+    weights /= weights.sum(axis=-1, keepdims=True)
+    parts = np.floor(values[..., np.newaxis] * weights).astype('int64')
+    parts[..., -1] += values - parts.sum(axis=-1)
+
+    return parts
+
+
+def batch_frames(names, codes, years, fossil, land_use, has_data, extra, steps, rng):
+    """
+    filas de un lote de entidades en formato largo para los dos csv
+    """
+    entity_pos, year_pos = np.nonzero(has_data)
+
+    columns = {COL_TOTAL: fossil + land_use, COL_LAND_USE: land_use, COL_FOSSIL: fossil}
+    for k in range(extra):
+        columns[f'Annual CO₂ emissions from synthetic source {k + 1}'] = np.round(
+            fossil * rng.uniform(0, 0.2, size=(len(names), 1))
+        ).astype('int64')
+
+    if steps > 1:
+        # pasos intra-anuales: filas repetidas (Entity, Year) que suman el valor anual
+        entity_pos = np.repeat(entity_pos, steps)
+        year_pos = np.repeat(year_pos, steps)
+        values = {col: split_steps(rng, v[has_data], steps).ravel() for col, v in columns.items()}
+    else:
+        values = {col: v[has_data] for col, v in columns.items()}
+
+    df_fossil = pd.DataFrame({
+        'Entity': names[entity_pos],
+        'Code': codes[entity_pos],
+        'Year': years[year_pos],
+        **values,
+    })
+    df_emissions = df_fossil[['Entity', 'Code', 'Year', COL_FOSSIL] + list(columns)[3:]]
+
+    return df_emissions, df_fossil
+
+
+def generate(name: str,
+             entities: int = 2000,
+             start_year: int = 1750,
+             end_year: int = 2024,
+             steps_per_year: int = 1,
+             extra_columns: int = 0,
+             regions: int = 6,
+             seed: int = 0) -> dict:
+    """
+    genera un conjunto sintético con el esquema de los csv de owid:
+    `entities` países (códigos de 3 letras), `regions` agregados sin
+    código, la fila World (OWID_WRL) y columnas extra opcionales.
+    el esquema no tiene columna intra-anual, así que con
+    steps_per_year > 1 cada (entidad, año) se escribe en varias filas
+    cuyos valores suman el total anual (la app suma filas repetidas)
+    """
+    rng = np.random.default_rng(seed)
+    paths = synthetic_paths(name)
+    os.makedirs(paths['dir'], exist_ok=True)
+
+    # códigos reales de owid, para no repetirlos
+    reserved = set()
+    for csv_path in glob.glob(os.path.join(RAW_DIR, '*', '*.csv')):
+        reserved |= set(pd.read_csv(csv_path, usecols=['Code'])['Code'].dropna().str.upper())
+
+    codes = np.array(synthetic_codes(entities, reserved), dtype=object)
+    names = np.array([f'Entidad {c}' for c in codes], dtype=object)
+    region_of = rng.integers(0, regions, size=entities) if regions else None
+    years = np.arange(start_year, end_year + 1, dtype='int64')
+
+    n_cols = 3 + extra_columns
+    world = np.zeros((len(years), n_cols), dtype='int64')
+    by_region = np.zeros((regions, len(years), n_cols), dtype='int64')
+    rows = 0
+
+    for i, start in enumerate(range(0, entities, BATCH_ENTITIES)):
+        batch = slice(start, min(start + BATCH_ENTITIES, entities))
+        fossil, land_use, has_data = entity_series(rng, batch.stop - batch.start, years)
+        df_emissions, df_fossil = batch_frames(
+            names[batch], codes[batch], years, fossil, land_use, has_data,
+            extra_columns, steps_per_year, rng
+        )
+
+        mode, header = ('w', True) if i == 0 else ('a', False)
+        df_emissions.to_csv(paths['csv'], mode=mode, header=header, index=False)
+        df_fossil.to_csv(paths['csv_fossil'], mode=mode, header=header, index=False)
+        rows += len(df_fossil)
+
+        # totales por año para World y los agregados regionales
+        year_pos = np.searchsorted(years, df_fossil['Year'].to_numpy())
+        values = df_fossil.iloc[:, 3:].to_numpy(dtype='int64')
+        np.add.at(world, year_pos, values)
+        if regions:
+            region_pos = region_of[batch][pd.Index(codes[batch]).get_indexer(df_fossil['Code'])]
+            np.add.at(by_region, (region_pos, year_pos), values)
+
+    # filas agregadas: World con código OWID_WRL, regiones sin código
+    aggregates = [('World', 'OWID_WRL', world)] + [
+        (f'Región sintética {r + 1}', None, by_region[r]) for r in range(regions)
+    ]
+    value_columns = list(df_fossil.columns[3:])
+    df_aggregates = pd.concat([
+        pd.DataFrame({'Entity': entity, 'Code': code, 'Year': years, **dict(zip(value_columns, totals.T))})
+        for entity, code, totals in aggregates
+    ])
+
+    df_aggregates.to_csv(paths['csv_fossil'], mode='a', header=False, index=False)
+    df_aggregates[list(df_emissions.columns)].to_csv(paths['csv'], mode='a', header=False, index=False)
+
+    with open(paths['codes'], 'w', encoding='utf-8') as f:
+        f.write('\n'.join(codes) + '\n')
+
+    return {
+        'rows': rows + len(df_aggregates),
+        'csv': paths['csv'],
+        'csv_fossil': paths['csv_fossil'],
+    }
+
+
+def read_synthetic_codes(name: str) -> frozenset:
+    """
+    códigos de país de un conjunto sintético (ver synthetic_codes)
+    """
+    path = synthetic_paths(name)['codes']
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'no se encontró {path}: volvé a generar el conjunto con synthetic_data.py')
+
+    with open(path, encoding='utf-8') as f:
+        return frozenset(line.strip() for line in f if line.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='genera csv sintéticos con el esquema de owid para medir la app a escala'
+    )
+    parser.add_argument('name', help=f'nombre del conjunto (se escribe en data/synthetic/<name>/; '
+                                     f'la app lo usa con {SCALE_ENV_VAR}=<name>)')
+    parser.add_argument('--entities', type=int, default=2000, help='cantidad de países sintéticos')
+    parser.add_argument('--start-year', type=int, default=1750)
+    parser.add_argument('--end-year', type=int, default=2024)
+    parser.add_argument('--steps-per-year', type=int, default=1,
+                        help='filas por (entidad, año), p. ej. 12 para datos mensuales')
+    parser.add_argument('--extra-columns', type=int, default=0, help='columnas de emisiones adicionales')
+    parser.add_argument('--regions', type=int, default=6, help='agregados regionales sin código')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = generate(
+        args.name,
+        entities=args.entities,
+        start_year=args.start_year,
+        end_year=args.end_year,
+        steps_per_year=args.steps_per_year,
+        extra_columns=args.extra_columns,
+        regions=args.regions,
+        seed=args.seed
+    )
+
+    for key in ('csv', 'csv_fossil'):
+        size_mb = os.path.getsize(result[key]) / 1e6
+        print(f'generado: {result[key]} ({size_mb:,.1f} MB)')
+    print(f'filas: {result["rows"]:,}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import gzip
+import os
+import re
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# ============================
+# carga compacta de figuras y tablas
+# ============================
+# lo que viaja al navegador en cada rerun: la geometría del mapa sin bbox
+# ni propiedades y con las coordenadas a la precisión que se ve, los
+# arreglos numéricos de las figuras en el tipo más chico que conserva lo
+# que se muestra (plotly los envía como arreglos binarios en base64) y
+# las columnas de las tablas reducidas antes de pasar a arrow.
+# CO2_COMPACT_TRANSPORT=0 lo desactiva (p. ej. para comparar, ver benchmark.py)
+TRANSPORT_ENV_VAR = 'CO2_COMPACT_TRANSPORT'
+
+# sube si cambia el formato compacto: invalida el geojson y las figuras guardadas
+TRANSPORT_VERSION = 1
+
+# decimales de las coordenadas del mapa sin simplificar (~100 m en el ecuador)
+GEOJSON_DECIMALS = 3
+
+# formato de columna de tabla con decimales fijos, p. ej. '%.2f%%'
+_FIXED_FORMAT = re.compile(r'%[^a-z%]*\.(\d+)f')
+
+_settings = {
+    'compact': os.environ.get(TRANSPORT_ENV_VAR, '1').strip().lower() not in ('0', 'false', 'no'),
+}
+
+
+def is_compact() -> bool:
+    return _settings['compact']
+
+
+@contextmanager
+def uncompacted():
+    """
+    desactiva la compactación dentro del bloque (para medir lo que se ahorra)
+    """
+    previous = _settings['compact']
+    _settings['compact'] = False
+    try:
+        yield
+    finally:
+        _settings['compact'] = previous
+
+
+def transport_key() -> str:
+    """
+    parte de las claves de caché de lo que depende del formato de transporte
+    """
+    return f'compacto-{TRANSPORT_VERSION}' if is_compact() else 'completo'
+
+
+def compact_array(values, decimals: int = None):
+    """
+    arreglo numérico en el tipo más chico que conserva lo que se muestra.
+    con `decimals` los valores se redondean a esos decimales; sin él basta
+    con ~7 cifras significativas (colores, posiciones). los valores enteros
+    pasan a int32 (plotly elige int8 / int16 al serializar) y los demás a
+    float32 si el error cabe en la precisión mostrada. lo que no es
+    numérico se devuelve tal cual
+    """
+    if not is_compact():
+        return values
+
+    arr = np.asarray(values)
+    if arr.dtype.kind not in 'iuf':
+        return values
+    if arr.dtype.kind in 'iu':
+        return arr
+    if decimals is not None:
+        arr = np.round(arr, decimals)
+
+    finite = arr[np.isfinite(arr)]
+    integral = finite.size == arr.size and np.array_equal(finite, np.round(finite))
+    if integral and (arr.size == 0 or np.abs(arr).max() < 2 ** 31):
+        return arr.astype(np.int32)
+
+    single = arr.astype(np.float32)
+    if decimals is None or finite.size == 0:
+        return single
+
+    error = np.abs(single[np.isfinite(arr)].astype(np.float64) - finite).max()
+    return single if error < 0.5 * 10.0 ** -decimals else arr
+
+
+def compact_figure(fig, decimals: int = None, attributes: tuple = ('x', 'y', 'z')):
+    """
+    aplica compact_array a los arreglos `attributes` de cada traza, con los
+    decimales que muestra el hover de la figura
+    """
+    if not is_compact():
+        return fig
+
+    for trace in fig.data:
+        for attr in attributes:
+            values = getattr(trace, attr, None)
+            if values is None or isinstance(values, str):
+                continue
+            compact = compact_array(values, decimals)
+            if compact is not values:
+                trace[attr] = compact
+
+    return fig
+
+
+def _compact_ring(coords: list, decimals: int) -> list:
+    points = np.round(np.asarray(coords, dtype='float64'), decimals)
+
+    # puntos repetidos seguidos que deja el redondeo; un anillo que se
+    # reduciría a menos de 4 puntos (cerrado) queda como estaba
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = (points[1:] != points[:-1]).any(axis=1)
+    if keep.sum() >= 4:
+        points = points[keep]
+
+    return points.tolist()
+
+
+def compact_geojson(geojson: dict, decimals: int) -> dict:
+    """
+    geojson con solo lo que usa plotly (id y geometría de cada feature,
+    sin bbox ni propiedades) y las coordenadas a `decimals` decimales
+    """
+    if not is_compact():
+        return geojson
+
+    features = []
+    for feature in geojson['features']:
+        geometry = feature['geometry']
+        if geometry['type'] == 'Polygon':
+            coordinates = [_compact_ring(ring, decimals) for ring in geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            coordinates = [[_compact_ring(ring, decimals) for ring in polygon] for polygon in geometry['coordinates']]
+        else:
+            coordinates = geometry['coordinates']
+
+        features.append({
+            'type': 'Feature',
+            'id': feature['id'],
+            'geometry': {'type': geometry['type'], 'coordinates': coordinates},
+        })
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def format_decimals(fmt: str):
+    """
+    decimales que muestra un formato de columna ('%,d' → 0, '%.2f%%' → 2),
+    o None si no tiene decimales fijos
+    """
+    if fmt is None:
+        return None
+    if fmt.endswith('d'):
+        return 0
+
+    match = _FIXED_FORMAT.search(fmt)
+    return int(match.group(1)) if match else None
+
+
+def compact_table(df: pd.DataFrame, formats: dict) -> pd.DataFrame:
+    """
+    tabla con columnas más livianas en arrow: números con formato a sus
+    decimales en el tipo más chico (enteros de 8 / 16 / 32 bits, float32),
+    otros enteros reducidos y textos repetidos como categóricas
+    (diccionario en arrow)
+    """
+    if not is_compact():
+        return df
+
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_bool_dtype(values.dtype):
+            columns[col] = values
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            decimals = format_decimals(formats.get(col))
+            if values.dtype.kind == 'f' and decimals is None:
+                columns[col] = values
+                continue
+            compact = compact_array(values.to_numpy(), decimals)
+            if compact.dtype.kind in 'iu':
+                compact = pd.to_numeric(compact, downcast='integer')
+            columns[col] = pd.Series(compact, index=df.index, name=col)
+        elif len(values) > 1 and values.nunique() * 2 <= len(values):
+            columns[col] = values.astype('category')
+        else:
+            columns[col] = values
+
+    return pd.DataFrame(columns, index=df.index)
+
+
+def arrow_bytes(df: pd.DataFrame) -> int:
+    """
+    bytes de la tabla en arrow ipc, como la envía st.dataframe
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    return sink.getvalue().size
+
+
+def gzip_bytes(text: str) -> int:
+    """
+    bytes de un json con gzip, como viaja si el proxy comprime
+    """
+    return len(gzip.compress(text.encode('utf-8'), compresslevel=6))